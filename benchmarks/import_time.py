@@ -0,0 +1,82 @@
+"""
+Import-time benchmark. Imports each lightweight toolkit module, i.e. every
+module but models and pipeline, in a fresh interpreter, checks that no heavy
+backend was pulled in, and fails when the import takes longer than the budget
+on top of importing NumPy.
+
+Usage:
+    python benchmarks/import_time.py [--budget-ms 150] [--repeats 5]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+
+# the modules that are expected to load TensorFlow and Keras, every other toolkit module is checked
+HEAVY_TOOLKIT_MODULES = {"models", "pipeline"}
+
+TOOLKIT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "toolkit")
+
+LIGHT_MODULES = sorted(
+    f"toolkit.{name[:-3]}" for name in os.listdir(TOOLKIT_DIR)
+    if name.endswith(".py") and name != "__init__.py" and name[:-3] not in HEAVY_TOOLKIT_MODULES
+)
+
+HEAVY_MODULES = ["tensorflow", "keras", "matplotlib", "seaborn", "sklearn", "pandas"]
+
+PROBE = """
+import sys, json, time
+import numpy
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = sorted({{name.split('.')[0] for name in sys.modules}} & set({heavy!r}))
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure(module: str, repeats: int) -> dict:
+    """
+    Measures the import time of a module in fresh interpreters.
+
+    Args:
+        module (str): The module name.
+        repeats (int): The number of interpreters to start.
+    Returns:
+        dict: The best import time in milliseconds and the heavy modules loaded.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = PROBE.format(module=module, heavy=HEAVY_MODULES)
+    best, heavy = float("inf"), []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        best = min(best, result["seconds"])
+        heavy = result["heavy"]
+    return {"module": module, "ms": best * 1000, "heavy": heavy}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=150.0, help="The maximum import time of each module.")
+    parser.add_argument("--repeats", type=int, default=5, help="The number of fresh interpreters per module.")
+    args = parser.parse_args()
+
+    failed = False
+    for module in LIGHT_MODULES:
+        result = measure(module, args.repeats)
+        status = "ok"
+        if result["heavy"]:
+            status = f"FAIL: imports {', '.join(result['heavy'])}"
+        elif result["ms"] > args.budget_ms:
+            status = f"FAIL: over the {args.budget_ms:.0f} ms budget"
+        failed = failed or status != "ok"
+        print(f"{module:<28} {result['ms']:8.1f} ms  {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Scaling benchmark of the process-pool feature builder against the per-file
+path of the notebooks (get_1st_block_bytes, byte integers, then pad_array or
+byte_frequency_histogram), on a synthetic corpus.
+
+Usage:
+    python -m benchmarks.parallel_features [--files 20000] [--timesteps 4096] [--workers 1,2,4,8]
+                                           [--output parallel_features.json]
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+from benchmarks.run import corpus_paths
+from benchmarks.synthetic import make_corpus
+from toolkit.features import build_features
+from toolkit.utils import get_1st_block_bytes, pad_array, byte_frequency_histogram
+
+
+def current_path(paths: list, timesteps: int) -> np.ndarray:
+    """
+    Builds the first block features one file at a time, as the notebooks do.
+
+    Args:
+        paths (list): The paths of the files.
+        timesteps (int): 256 for histograms, padded bytes otherwise.
+    Returns:
+        np.ndarray: The (n, timesteps) features.
+    """
+    rows = []
+    for path in paths:
+        byte_integers = np.array([byte for byte in get_1st_block_bytes(path)])
+        if timesteps == 256:
+            rows.append(byte_frequency_histogram(byte_integers))
+        else:
+            rows.append(pad_array(byte_integers, length=timesteps))
+    return np.array(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20000, help="The number of synthetic files.")
+    parser.add_argument("--corpus", default=None, help="An existing corpus directory to use instead.")
+    parser.add_argument("--timesteps", type=int, default=4096, help="256 for histograms, 4096 for padded bytes.")
+    parser.add_argument("--workers", default=None, help="Comma separated worker counts, powers of two up to the core count by default.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="A file receiving the results as JSON.")
+    args = parser.parse_args()
+
+    n_cores = os.cpu_count() or 1
+    if args.workers:
+        worker_counts = [int(count) for count in args.workers.split(",")]
+    else:
+        worker_counts = [1 << i for i in range(n_cores.bit_length()) if 1 << i <= n_cores]
+        worker_counts += [n_cores] if worker_counts[-1] != n_cores else []
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if args.corpus:
+            paths = corpus_paths(args.corpus)
+        else:
+            paths = make_corpus(temp_dir, args.files, seed=args.seed, max_size=64 * 1024)
+
+        start = time.perf_counter()
+        expected = current_path(paths, args.timesteps)
+        baseline = time.perf_counter() - start
+        results = {"current": {"workers": 1, "seconds": baseline, "files_per_sec": len(paths) / baseline, "speedup": 1.0}}
+
+        for n_workers in worker_counts:
+            start = time.perf_counter()
+            features, _, _ = build_features(paths, ("first",), timesteps=args.timesteps, n_workers=n_workers)
+            seconds = time.perf_counter() - start
+            if not np.array_equal(features[:, 0], expected):
+                raise AssertionError(f"build_features with {n_workers} workers differs from the current path.")
+            results[f"build_features[{n_workers}]"] = {
+                "workers": n_workers, "seconds": seconds, "files_per_sec": len(paths) / seconds, "speedup": baseline / seconds
+            }
+
+    print(f"{'path':<24}{'workers':>8}{'seconds':>10}{'files/s':>12}{'speedup':>9}")
+    for name, metrics in results.items():
+        print(f"{name:<24}{metrics['workers']:>8}{metrics['seconds']:>10.3f}{metrics['files_per_sec']:>12.1f}{metrics['speedup']:>8.1f}x")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"config": {"files": len(paths), "timesteps": args.timesteps, "cores": n_cores}, "results": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
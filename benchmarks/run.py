@@ -0,0 +1,290 @@
+"""
+Throughput benchmarks for block extraction, feature building, DataFrame
+assembly and model training and inference, on a synthetic corpus.
+
+Every benchmark records files/sec, MB/s, p50/p99 latency and the peak RSS of
+the process so far to a JSON file. When a baseline JSON file is given, a
+benchmark whose files/sec drops more than the tolerance below the baseline is
+reported as a regression and the exit code is 1.
+
+Usage:
+    python -m benchmarks.run [--files 2000] [--mix pdf=2,txt=1] [--models Ffnn2,Cnn2]
+                             [--output results.json] [--baseline baseline.json] [--tolerance 0.2]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+
+import numpy as np
+
+from benchmarks.synthetic import make_corpus
+from toolkit.utils import (
+    get_1st_block_bytes, get_2nd_block_bytes, get_last_block_bytes, read_blocks,
+    read_blocks_parallel, pad_array, bytes_to_array, byte_frequency_histogram, byte_frequency_histograms,
+    block_features, convert_cat2num
+)
+
+
+MODEL_CLASSES = ["Ffnn", "Ffnn2", "Cnn", "Cnn2", "Gru", "Lstm"]
+BATCH_SIZE = 256
+
+
+def peak_rss_mb() -> float:
+    """
+    Gets the peak resident set size of the process.
+
+    Returns:
+        float: The peak RSS in MB.
+    """
+    try:
+        import resource
+    except ImportError:
+        import psutil
+
+        return psutil.Process().memory_info().peak_wset / 1024 ** 2
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB elsewhere
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(latencies: list, n_files: int, n_bytes: int) -> dict:
+    """
+    Summarizes the latencies of a benchmark.
+
+    Args:
+        latencies (list): The duration of every call in seconds.
+        n_files (int): The number of files processed.
+        n_bytes (int): The number of bytes processed.
+    Returns:
+        dict: The benchmark metrics.
+    """
+    seconds = float(np.sum(latencies))
+    return {
+        "files": n_files,
+        "seconds": seconds,
+        "files_per_sec": n_files / seconds if seconds else 0.0,
+        "mb_per_sec": n_bytes / 1024 ** 2 / seconds if seconds else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def run_calls(fn, items: list) -> list:
+    """
+    Calls fn on every item and times each call.
+
+    Args:
+        fn (callable): The benchmarked function.
+        items (list): The arguments of each call.
+    Returns:
+        list: The duration of every call in seconds.
+    """
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_reads(fn, items: list, size=len) -> tuple[list, int]:
+    """
+    Calls a block reader on every item, times each call and counts the bytes it returns.
+
+    Args:
+        fn (callable): The benchmarked reader.
+        items (list): The arguments of each call.
+        size (callable): Gets the number of bytes read from the result of a call.
+    Returns:
+        tuple[list, int]: The duration of every call in seconds, and the number of bytes read.
+    """
+    latencies, n_bytes = [], 0
+    for item in items:
+        start = time.perf_counter()
+        result = fn(item)
+        latencies.append(time.perf_counter() - start)
+        n_bytes += int(size(result))
+    return latencies, n_bytes
+
+
+def corpus_paths(directory: str) -> list:
+    """
+    Lists the regular files of a corpus directory, skipping its subdirectories.
+
+    Args:
+        directory (str): The corpus directory.
+    Returns:
+        list: The sorted paths of the files.
+    """
+    with os.scandir(directory) as entries:
+        return sorted(entry.path for entry in entries if entry.is_file())
+
+
+def batches(items: list, batch_size: int=BATCH_SIZE) -> list:
+    return [items[start:start + batch_size] for start in range(0, len(items), batch_size)]
+
+
+def bench_extraction(paths: list, results: dict) -> list:
+    """
+    Benchmarks the block readers and returns the first blocks.
+    """
+    sizes = [os.path.getsize(path) for path in paths]
+    first_blocks = [get_1st_block_bytes(path) for path in paths]
+
+    def bench_reader(name: str, fn, items: list, size=len) -> None:
+        latencies, n_bytes = run_reads(fn, items, size)
+        results[name] = summarize(latencies, len(paths), n_bytes)
+
+    bench_reader("get_1st_block_bytes", get_1st_block_bytes, paths)
+    bench_reader("get_2nd_block_bytes", get_2nd_block_bytes, paths)
+    bench_reader("get_last_block_bytes", lambda item: get_last_block_bytes(item[0], item[1] / 1024), list(zip(paths, sizes)))
+    # the readers of many blocks return the number of bytes read from each block
+    selectors = ("first", "body", "last")
+    bench_reader("read_blocks", lambda batch: read_blocks(batch, selectors), batches(paths), lambda result: result[1].sum())
+    bench_reader("read_blocks_parallel", lambda batch: read_blocks_parallel(batch, selectors), batches(paths), lambda result: result[1].sum())
+    return first_blocks
+
+
+def bench_features(first_blocks: list, results: dict) -> None:
+    """
+    Benchmarks the byte conversion, padding and histogram functions.
+    """
+    n_bytes = sum(len(block) for block in first_blocks)
+    results["pad_array"] = summarize(
+        run_calls(lambda block: pad_array(np.array([byte for byte in block]), length=4096), first_blocks), len(first_blocks), n_bytes
+    )
+    results["bytes_to_array"] = summarize(run_calls(bytes_to_array, batches(first_blocks)), len(first_blocks), n_bytes)
+    results["byte_frequency_histogram"] = summarize(
+        run_calls(lambda block: byte_frequency_histogram(np.array([byte for byte in block], dtype=np.int64)), first_blocks),
+        len(first_blocks), n_bytes
+    )
+
+    def histograms(batch: list) -> np.ndarray:
+        blocks = bytes_to_array(batch, pad_value=0)
+        return byte_frequency_histograms(blocks, [len(block) for block in batch])
+
+    results["byte_frequency_histograms"] = summarize(run_calls(histograms, batches(first_blocks)), len(first_blocks), n_bytes)
+
+
+def bench_dataframe(directory: str, paths: list, results: dict) -> None:
+    """
+    Benchmarks the DataFrame assembly the system notebooks perform, over the
+    files of the corpus root.
+    """
+    import pandas as pd
+
+    start = time.perf_counter()
+    # get_file_types walks subdirectories but keeps bare file names, which would not resolve from the root
+    df = pd.DataFrame([{"file": os.path.basename(path), "type": os.path.splitext(path)[1][1:]} for path in paths])
+    df["size KB"] = df["file"].apply(lambda x: float(os.path.getsize(os.path.join(directory, x)) / 1024))
+    df["1st_block_bytes"] = df["file"].apply(lambda file: get_1st_block_bytes(os.path.join(directory, file)))
+    df["byte_integers"] = df["1st_block_bytes"].apply(lambda byte_sequence: np.array([byte for byte in byte_sequence]))
+    df["byte_integers"] = df["byte_integers"].apply(lambda arr: pad_array(arr, length=4096))
+    df["class"] = df["type"].apply(lambda file_type: convert_cat2num(file_type))
+    X = np.array([x for x in df["byte_integers"]])
+    y = np.array([y for y in df["class"]])
+    seconds = time.perf_counter() - start
+    results["dataframe_assembly"] = summarize([seconds], len(df), int(df["1st_block_bytes"].apply(len).sum()))
+
+
+def bench_models(paths: list, names: list, epochs: int, results: dict) -> None:
+    """
+    Benchmarks one training epoch and the prediction of every model class.
+    """
+    from toolkit import models
+
+    blocks, lengths = read_blocks(paths, ("first",))
+    labels = np.array([convert_cat2num(os.path.splitext(path)[1][1:]) for path in paths])
+    n_bytes = int(lengths.sum())
+    for name in names:
+        model = getattr(models, name)()
+        x = block_features(blocks[:, 0], lengths[:, 0], model.input_shape[1]).astype(np.float32)
+
+        start = time.perf_counter()
+        model.fit(x, labels, epochs=epochs, batch_size=32)
+        seconds = (time.perf_counter() - start) / epochs
+        results[f"{name}.fit"] = summarize([seconds], len(x), n_bytes)
+
+        model.predict_proba(x[:BATCH_SIZE], batch_size=BATCH_SIZE, verbose=0)
+        latencies = run_calls(lambda batch: model.predict_proba(batch, batch_size=BATCH_SIZE, verbose=0), batches(x))
+        results[f"{name}.predict"] = summarize(latencies, len(x), n_bytes)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compares benchmark results with a baseline.
+
+    Args:
+        results (dict): The benchmark metrics.
+        baseline (dict): The baseline benchmark metrics.
+        tolerance (float): The allowed relative files/sec drop.
+    Returns:
+        list: The (benchmark, files/sec, baseline files/sec) regressions.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        reference = baseline.get(name)
+        if reference and metrics["files_per_sec"] < reference["files_per_sec"] * (1 - tolerance):
+            regressions.append((name, metrics["files_per_sec"], reference["files_per_sec"]))
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2000, help="The number of synthetic files.")
+    parser.add_argument("--mix", default=None, help="The type weights, e.g. pdf=2,txt=1.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--corpus", default=None, help="An existing corpus directory to use instead.")
+    parser.add_argument("--models", default="", help=f"Comma separated model classes among {', '.join(MODEL_CLASSES)}.")
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=None, help="A previous results file to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="The allowed relative files/sec drop.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = args.corpus or temp_dir
+        if args.corpus:
+            paths = corpus_paths(directory)
+        else:
+            paths = make_corpus(directory, args.files, args.mix, args.seed)
+
+        results = {}
+        first_blocks = bench_extraction(paths, results)
+        bench_features(first_blocks, results)
+        bench_dataframe(directory, paths, results)
+        names = [name for name in args.models.split(",") if name]
+        for name in names:
+            if name not in MODEL_CLASSES:
+                parser.error(f"Unknown model class: {name}.")
+        if names:
+            bench_models(paths, names, args.epochs, results)
+
+    report = {
+        "config": {"files": len(paths), "mix": args.mix, "seed": args.seed, "python": platform.python_version(), "machine": platform.machine()},
+        "benchmarks": results
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+
+    print(f"{'benchmark':<28}{'files/s':>12}{'MB/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'RSS MB':>10}")
+    for name, metrics in results.items():
+        print(f"{name:<28}{metrics['files_per_sec']:>12.1f}{metrics['mb_per_sec']:>10.1f}{metrics['p50_ms']:>10.3f}{metrics['p99_ms']:>10.3f}{metrics['peak_rss_mb']:>10.1f}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)["benchmarks"]
+        regressions = compare(results, baseline, args.tolerance)
+        for name, current, reference in regressions:
+            print(f"REGRESSION {name}: {current:.1f} files/s against {reference:.1f} in the baseline")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
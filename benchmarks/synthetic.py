@@ -0,0 +1,132 @@
+"""
+Synthetic corpus generator. Writes files whose headers, bodies and trailers
+look like the 12 targeted file types, so benchmarks can run without govdocs1.
+
+Usage:
+    python benchmarks/synthetic.py DIRECTORY [--files 2000] [--mix pdf=2,txt=1] [--seed 42]
+"""
+import os
+import argparse
+
+import numpy as np
+
+
+FILE_TYPES = ["doc", "pdf", "ps", "xls", "ppt", "swf", "gif", "jpg", "png", "html", "txt", "xml"]
+
+HEADERS = {
+    "doc": b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",
+    "xls": b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",
+    "ppt": b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",
+    "pdf": b"%PDF-1.4\n",
+    "ps": b"%!PS-Adobe-3.0\n",
+    "swf": b"CWS\x08",
+    "gif": b"GIF89a",
+    "jpg": b"\xff\xd8\xff\xe0\x00\x10JFIF\x00",
+    "png": b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR",
+    "html": b"<!DOCTYPE html>\n<html><head><title>report</title></head><body>\n",
+    "xml": b"<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<records>\n",
+    "txt": b"",
+}
+
+TRAILERS = {
+    "pdf": b"\n%%EOF\n",
+    "ps": b"\n%%EOF\n",
+    "gif": b"\x3b",
+    "jpg": b"\xff\xd9",
+    "png": b"\x00\x00\x00\x00IEND\xaeB`\x82",
+    "html": b"\n</body></html>\n",
+    "xml": b"\n</records>\n",
+}
+
+TEXT_TYPES = {"ps", "html", "xml", "txt"}
+WORDS = np.array(b"the of and file type block byte data report government table page value".split())
+
+
+def parse_mix(mix: str | None) -> dict:
+    """
+    Parses a type mix such as "pdf=2,txt=1" into normalised weights.
+
+    Args:
+        mix (str | None): The type weights, a uniform mix if None.
+    Returns:
+        dict: The weight of each file type.
+    """
+    if not mix:
+        weights = {file_type: 1.0 for file_type in FILE_TYPES}
+    else:
+        weights = {}
+        for item in mix.split(","):
+            file_type, _, weight = item.partition("=")
+            if file_type not in FILE_TYPES:
+                raise ValueError(f"Unknown file type: {file_type}.")
+            weights[file_type] = float(weight or 1)
+    total = sum(weights.values())
+    return {file_type: weight / total for file_type, weight in weights.items()}
+
+
+def make_body(file_type: str, size: int, rng: np.random.Generator) -> bytes:
+    """
+    Generates a body whose byte distribution roughly matches the file type.
+
+    Args:
+        file_type (str): The file type.
+        size (int): The number of bytes.
+        rng (np.random.Generator): The random generator.
+    Returns:
+        bytes: The body bytes.
+    """
+    if file_type in TEXT_TYPES:
+        words = rng.choice(WORDS, size=size // 4 + 1)
+        return b" ".join(words)[:size]
+    if file_type in ("doc", "xls", "ppt"):
+        body = rng.integers(0, 256, size, dtype=np.uint8)
+        body[rng.random(size) < 0.5] = 0
+        return body.tobytes()
+    return rng.integers(0, 256, size, dtype=np.uint8).tobytes()
+
+
+def make_corpus(directory: str, n_files: int=2000, mix: str | None=None, seed: int=42, min_size: int=512, max_size: int=256 * 1024) -> list:
+    """
+    Writes a synthetic corpus with log-uniform file sizes.
+
+    Args:
+        directory (str): The output directory, created if needed.
+        n_files (int): The number of files.
+        mix (str | None): The type weights, e.g. "pdf=2,txt=1".
+        seed (int): The random seed.
+        min_size (int): The minimum file size in bytes.
+        max_size (int): The maximum file size in bytes.
+    Returns:
+        list: The paths of the generated files.
+    """
+    rng = np.random.default_rng(seed)
+    weights = parse_mix(mix)
+    file_types = rng.choice(list(weights), size=n_files, p=list(weights.values()))
+    sizes = np.exp(rng.uniform(np.log(min_size), np.log(max_size), n_files)).astype(int)
+
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i, (file_type, size) in enumerate(zip(file_types, sizes)):
+        header, trailer = HEADERS[file_type], TRAILERS.get(file_type, b"")
+        body = make_body(file_type, max(int(size) - len(header) - len(trailer), 0), rng)
+        path = os.path.join(directory, f"{i:06d}.{file_type}")
+        with open(path, "wb") as file:
+            file.write(header + body + trailer)
+        paths.append(path)
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory")
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--mix", default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    paths = make_corpus(args.directory, args.files, args.mix, args.seed)
+    print(f"Wrote {len(paths)} files to {args.directory}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .models_interface import BaseModel
+from .inference import model_timesteps
+from .utils import BLOCK_SIZE_BYTES, block_features, convert_num2cat
+
+
+class AsyncClassifier:
+    def __init__(
+        self,
+        model: BaseModel,
+        max_batch_size: int=64,
+        max_latency_ms: float=2.0,
+        max_pending: int=1024,
+        max_read_workers: int=16,
+        block_size: int=BLOCK_SIZE_BYTES
+    ):
+        """
+        Classifies files from asyncio code without blocking the event loop. First
+        blocks are read in a bounded thread pool, and a single background batching
+        coroutine groups the requests of many tasks into one model prediction,
+        which runs in its own thread. At most max_pending requests wait for a
+        batch: further requests wait in classify_bytes until there is room, which
+        slows producers down instead of growing memory. A cancelled request is
+        dropped from its batch.
+        Use it as an async context manager, or call close when done.
+
+        Args:
+            model (BaseModel): A trained model, or a NumpyModel.
+            max_batch_size (int): The maximum number of requests per prediction.
+            max_latency_ms (float): The maximum time a request waits for a batch to fill.
+            max_pending (int): The maximum number of requests waiting for a batch.
+            max_read_workers (int): The maximum number of concurrent block reads.
+            block_size (int): The number of bytes read from each file.
+        """
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+        self.max_pending = max_pending
+        self.max_read_workers = max_read_workers
+        self.block_size = block_size
+        self.timesteps = model_timesteps(model)
+        self.batches = 0
+        self.requests = 0
+        self._read_executor = ThreadPoolExecutor(max_workers=max_read_workers, thread_name_prefix="aio-read")
+        self._predict_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aio-predict")
+        self._read_slots = None
+        self._queue = None
+        self._task = None
+
+    async def __aenter__(self) -> "AsyncClassifier":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def classify_path(self, path: str) -> tuple:
+        """
+        Classifies a file from its first block.
+
+        Args:
+            path (str): The path of the file.
+        Returns:
+            tuple: The (type, confidence) of the file, (None, 0.0) for an empty file.
+        Raises:
+            OSError: When the file cannot be read.
+        """
+        self._start()
+        loop = asyncio.get_running_loop()
+        # bounding the submissions keeps reads of cancelled requests from piling up in the pool
+        async with self._read_slots:
+            data = await loop.run_in_executor(self._read_executor, self._read, path)
+        return await self.classify_bytes(data)
+
+    async def classify_bytes(self, data: bytes) -> tuple:
+        """
+        Classifies a file from its first bytes, e.g. the head of an upload.
+
+        Args:
+            data (bytes): The first bytes of the file, only block_size of them are used.
+        Returns:
+            tuple: The (type, confidence) of the file, (None, 0.0) when data is empty.
+        """
+        self._start()
+        data = data[:self.block_size]
+        if not data:
+            return None, 0.0
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((data, future))
+        probabilities = await future
+        class_num = int(np.argmax(probabilities))
+        return convert_num2cat(class_num), float(probabilities[class_num])
+
+    async def classify_paths(self, paths: list) -> list:
+        """
+        Classifies many files concurrently.
+
+        Args:
+            paths (list): The paths of the files.
+        Returns:
+            list: The (type, confidence) of each file, or the OSError raised reading it.
+        """
+        return await asyncio.gather(*(self.classify_path(path) for path in paths), return_exceptions=True)
+
+    async def close(self) -> None:
+        """
+        Serves the queued requests, stops the batching coroutine and the thread pools.
+        """
+        if self._task is not None:
+            await self._queue.put(None)
+            await self._task
+            self._task = None
+        self._read_executor.shutdown(wait=False, cancel_futures=True)
+        self._predict_executor.shutdown(wait=True)
+
+    def _start(self) -> None:
+        """
+        Helper method. Starts the batching coroutine on the running event loop.
+        """
+        if self._task is None:
+            self._read_slots = asyncio.Semaphore(self.max_read_workers)
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def _read(self, path: str) -> bytes:
+        """
+        Helper method. Reads the first block of a file in a reader thread.
+        """
+        with open(path, "rb") as file:
+            return file.read(self.block_size)
+
+    async def _run(self) -> None:
+        """
+        Helper method. Collects requests into batches and runs the predictions.
+        """
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is None:
+                    return
+                batch = [item]
+                deadline = loop.time() + self.max_latency
+                closing = False
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    if item is None:
+                        closing = True
+                        break
+                    batch.append(item)
+
+                await self._predict(batch)
+                batch = []
+                if closing:
+                    return
+        except asyncio.CancelledError:
+            # fail the requests that will never be served instead of leaving them waiting
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not None:
+                    batch.append(item)
+            for _, future in batch:
+                future.cancel()
+            raise
+
+    async def _predict(self, batch: list) -> None:
+        """
+        Helper method. Predicts a batch in the prediction thread and resolves its futures.
+        """
+        batch = [(data, future) for data, future in batch if not future.done()]
+        if not batch:
+            return
+        blocks = np.zeros((len(batch), self.block_size), dtype=np.uint8)
+        lengths = np.zeros(len(batch), dtype=np.int32)
+        for i, (data, _) in enumerate(batch):
+            blocks[i, :len(data)] = np.frombuffer(data, dtype=np.uint8)
+            lengths[i] = len(data)
+
+        loop = asyncio.get_running_loop()
+        try:
+            probabilities = await loop.run_in_executor(self._predict_executor, self._predict_blocks, blocks, lengths)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), probability in zip(batch, probabilities):
+            if not future.done():
+                future.set_result(probability)
+        self.batches += 1
+        self.requests += len(batch)
+
+    def _predict_blocks(self, blocks: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """
+        Helper method. Builds the features and predicts a batch in the prediction thread.
+        """
+        return self.model.predict_proba(block_features(blocks, lengths, self.timesteps), batch_size=len(blocks), verbose=0)
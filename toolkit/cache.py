@@ -0,0 +1,427 @@
+import os
+import json
+import uuid
+import sqlite3
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+import numpy as np
+
+from .utils import BLOCK_SIZE_BYTES, read_blocks_parallel
+
+
+class BlockCache:
+    BLOCKS_FILE = "blocks-{generation}.npy"
+    INDEX_FILE = "index-{generation}.npz"
+    META_FILE = "meta.json"
+    CHUNK_SIZE = 4096
+
+    def __init__(self, cache_dir: str):
+        """
+        Opens a block dataset cache. The block matrix is memory-mapped read-only so
+        opening is near instant and rows are only paged in when used. Build a cache
+        with BlockCache.build, or BlockCache.load_or_build to keep it in sync with
+        the corpus.
+
+        Every build writes its block matrix and index under a new generation id,
+        and meta.json, which names the current generation, is replaced last. A
+        build interrupted at any point leaves the previous generation in use.
+
+        Args:
+            cache_dir (str): The cache directory.
+        Raises:
+            ValueError: When the index and the block matrix do not belong together.
+        """
+        self.cache_dir = cache_dir
+        with open(os.path.join(cache_dir, self.META_FILE), "r") as file:
+            meta = json.load(file)
+        self.selectors = tuple(meta["blocks"])
+        self.block_size = meta["block_size"]
+        self.snapshot = meta["snapshot"]
+        self.generation = meta["generation"]
+
+        with np.load(os.path.join(cache_dir, self.INDEX_FILE.format(generation=self.generation))) as index:
+            generation = str(index["generation"])
+            self.paths = index["paths"]
+            self.sizes = index["sizes"]
+            self.mtimes = index["mtimes"]
+            self.types = index["types"]
+            self.lengths = index["lengths"]
+        self.blocks = np.load(os.path.join(cache_dir, self.BLOCKS_FILE.format(generation=self.generation)), mmap_mode="r")
+        self.errors = {}
+
+        if generation != self.generation or len(self.blocks) != len(self.paths) or len(self.lengths) != len(self.paths):
+            raise ValueError(f"The cache in {cache_dir} is inconsistent, rebuild it.")
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    @classmethod
+    def build(cls, cache_dir: str, paths: list, blocks: tuple=("first", "body", "last"), block_size: int=BLOCK_SIZE_BYTES, types: list | None=None, max_workers: int=8) -> "BlockCache":
+        """
+        Builds a cache by reading the selected blocks of every file once.
+
+        Args:
+            cache_dir (str): The cache directory, created if needed.
+            paths (list): The paths of the files to cache.
+            blocks (tuple): Block selectors as in read_blocks.
+            block_size (int): The block size in bytes.
+            types (list | None): The file types, taken from the extensions if None.
+            max_workers (int): The number of reader threads.
+        Returns:
+            BlockCache: The opened cache. Files that could not be read are left
+                out and listed in its errors attribute.
+        """
+        return cls._write(cache_dir, paths, tuple(blocks), block_size, types, None, max_workers)
+
+    @classmethod
+    def load_or_build(cls, cache_dir: str, paths: list, blocks: tuple=("first", "body", "last"), block_size: int=BLOCK_SIZE_BYTES, types: list | None=None, max_workers: int=8) -> "BlockCache":
+        """
+        Opens the cache in cache_dir and brings it up to date with paths, or builds
+        it when it does not exist or was built with other block selectors.
+
+        Args:
+            cache_dir (str): The cache directory.
+            paths (list): The paths of the files to cache.
+            blocks (tuple): Block selectors as in read_blocks.
+            block_size (int): The block size in bytes.
+            types (list | None): The file types, taken from the extensions if None.
+            max_workers (int): The number of reader threads.
+        Returns:
+            BlockCache: The up-to-date cache.
+        """
+        if os.path.isfile(os.path.join(cache_dir, cls.META_FILE)):
+            try:
+                cache = cls(cache_dir)
+            except (OSError, KeyError, ValueError):
+                # a cache written by an older version or damaged by hand is rebuilt
+                cache = None
+            if cache is not None and cache.selectors == tuple(blocks) and cache.block_size == block_size:
+                return cache.update(paths, types=types, max_workers=max_workers)
+        return cls.build(cache_dir, paths, blocks, block_size, types, max_workers)
+
+    def update(self, paths: list, types: list | None=None, max_workers: int=8) -> "BlockCache":
+        """
+        Brings the cache up to date with paths. Only files that were added or whose
+        size or modification time changed are read again, files missing from paths
+        are dropped, and the cache is left untouched when the snapshot is the same.
+
+        Args:
+            paths (list): The paths of the files to cache.
+            types (list | None): The file types, taken from the extensions if None.
+            max_workers (int): The number of reader threads.
+        Returns:
+            BlockCache: The up-to-date cache.
+        """
+        return self._write(self.cache_dir, paths, self.selectors, self.block_size, types, self, max_workers)
+
+    def labels(self, classes: dict) -> np.ndarray:
+        """
+        Maps the cached file types to numerical classes.
+
+        Args:
+            classes (dict): A mapping from file type to class.
+        Returns:
+            np.ndarray: The classes, 0 for types missing from the mapping.
+        """
+        return np.array([classes.get(file_type, 0) for file_type in self.types], dtype=np.int64)
+
+    @classmethod
+    def _write(cls, cache_dir: str, paths: list, selectors: tuple, block_size: int, types: list | None, previous: "BlockCache | None", max_workers: int) -> "BlockCache":
+        """
+        Helper method. Stats the files, reuses the rows of previous whose key is
+        unchanged, reads the others and writes the cache files.
+        """
+        if types is None:
+            types = [os.path.splitext(path)[1][1:] for path in paths]
+        if len(types) != len(paths):
+            raise ValueError("paths and types must have the same length.")
+
+        errors = {}
+        keys = []
+        for path, file_type in zip(paths, types):
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                errors[path] = e
+                continue
+            keys.append((os.fspath(path), stat.st_size, stat.st_mtime_ns, file_type))
+
+        snapshot = _snapshot(keys)
+        if previous is not None and previous.snapshot == snapshot:
+            previous.errors = errors
+            return previous
+
+        reused = {}
+        if previous is not None:
+            for row, key in enumerate(zip(previous.paths, previous.sizes, previous.mtimes)):
+                reused[(str(key[0]), int(key[1]), int(key[2]))] = row
+
+        os.makedirs(cache_dir, exist_ok=True)
+        generation = uuid.uuid4().hex
+        blocks_tmp = os.path.join(cache_dir, cls.BLOCKS_FILE.format(generation=generation) + ".tmp")
+        out = np.lib.format.open_memmap(blocks_tmp, mode="w+", dtype=np.uint8, shape=(len(keys), len(selectors), block_size))
+        lengths = np.zeros((len(keys), len(selectors)), dtype=np.int32)
+
+        stale = []
+        for row, (path, size, mtime, _) in enumerate(keys):
+            previous_row = reused.get((path, size, mtime))
+            if previous_row is None:
+                stale.append(row)
+            else:
+                out[row] = previous.blocks[previous_row]
+                lengths[row] = previous.lengths[previous_row]
+
+        failed = []
+        for start in range(0, len(stale), cls.CHUNK_SIZE):
+            rows = stale[start:start + cls.CHUNK_SIZE]
+            chunk, chunk_lengths, chunk_errors = read_blocks_parallel([keys[row][0] for row in rows], selectors, block_size, max_workers=max_workers)
+            out[rows] = chunk
+            lengths[rows] = chunk_lengths
+            for i, error in chunk_errors.items():
+                errors[keys[rows[i]][0]] = error
+                failed.append(rows[i])
+
+        if failed:
+            keep = np.setdiff1d(np.arange(len(keys)), failed)
+            compact_tmp = blocks_tmp + ".compact"
+            compact = np.lib.format.open_memmap(compact_tmp, mode="w+", dtype=np.uint8, shape=(len(keep), len(selectors), block_size))
+            for start in range(0, len(keep), cls.CHUNK_SIZE):
+                compact[start:start + cls.CHUNK_SIZE] = out[keep[start:start + cls.CHUNK_SIZE]]
+            compact.flush()
+            del out, compact
+            os.replace(compact_tmp, blocks_tmp)
+            keys = [keys[row] for row in keep]
+            lengths = lengths[keep]
+            snapshot = _snapshot(keys)
+        else:
+            out.flush()
+            del out
+
+        index_tmp = os.path.join(cache_dir, cls.INDEX_FILE.format(generation=generation) + ".tmp.npz")
+        np.savez(
+            index_tmp,
+            generation=np.array(generation),
+            paths=np.array([key[0] for key in keys], dtype=str),
+            sizes=np.array([key[1] for key in keys], dtype=np.int64),
+            mtimes=np.array([key[2] for key in keys], dtype=np.int64),
+            types=np.array([key[3] for key in keys], dtype=str),
+            lengths=lengths
+        )
+        os.replace(blocks_tmp, os.path.join(cache_dir, cls.BLOCKS_FILE.format(generation=generation)))
+        os.replace(index_tmp, os.path.join(cache_dir, cls.INDEX_FILE.format(generation=generation)))
+
+        # switching meta.json to the new generation is the single atomic commit point
+        meta_tmp = os.path.join(cache_dir, cls.META_FILE + ".tmp")
+        with open(meta_tmp, "w") as file:
+            json.dump({"blocks": list(selectors), "block_size": block_size, "snapshot": snapshot, "generation": generation}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(meta_tmp, os.path.join(cache_dir, cls.META_FILE))
+
+        # release the previous memory map so its files can be removed on every platform
+        if previous is not None:
+            previous.blocks = None
+        cls._remove_stale(cache_dir, generation)
+
+        cache = cls(cache_dir)
+        cache.errors = errors
+        return cache
+
+    @classmethod
+    def _remove_stale(cls, cache_dir: str, generation: str) -> None:
+        """
+        Helper method. Removes the files of other generations, including the
+        leftovers of interrupted builds.
+        """
+        current = {cls.BLOCKS_FILE.format(generation=generation), cls.INDEX_FILE.format(generation=generation), cls.META_FILE}
+        prefixes = (cls.BLOCKS_FILE.split("{")[0], cls.INDEX_FILE.split("{")[0], "blocks.npy", "index.npz")
+        for name in os.listdir(cache_dir):
+            if name not in current and name.startswith(prefixes):
+                try:
+                    os.remove(os.path.join(cache_dir, name))
+                except OSError:
+                    # still memory-mapped by an open cache on Windows, removed by a later build
+                    pass
+
+
+class PredictionCache:
+    ENTRY_OVERHEAD_BYTES = 128
+
+    def __init__(self, model, max_bytes: int=64 * 1024 ** 2, path: str | None=None):
+        """
+        A prediction cache in front of a model, keyed by a hash of each input row
+        and of the model weights, so identical blocks (all-zero tails, shared
+        headers, templates) are only scored once. Entries live in an LRU memory
+        tier bounded by max_bytes and, when a path is given, in a persistent
+        SQLite tier shared across runs. It has the predict and predict_proba API
+        of BaseModel so it can replace the model it wraps.
+
+        Args:
+            model (BaseModel | NumpyModel): The model to cache.
+            max_bytes (int): The memory budget of the LRU tier.
+            path (str | None): The SQLite file of the persistent tier.
+        """
+        self.model = model
+        self.max_bytes = max_bytes
+        self.fingerprint = model_fingerprint(model)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS predictions (key BLOB PRIMARY KEY, probabilities BLOB)")
+
+    @property
+    def input_shape(self) -> tuple:
+        return self.model.input_shape
+
+    def predict(self, x: np.ndarray, batch_size: int | None=32) -> np.ndarray:
+        """
+        This method is for making predictions on unseen data.
+        """
+        self.predictions = self.predict_proba(x, batch_size=batch_size)
+        return np.argmax(self.predictions, axis=-1)
+
+    def predict_proba(self, x: np.ndarray, batch_size: int | None=32, verbose: str | int=0) -> np.ndarray:
+        """
+        This method returns the class probabilities predicted on unseen data,
+        running the model on the rows missing from the cache only.
+        """
+        x = np.ascontiguousarray(x)
+        prefix = f"{self.fingerprint}:{x.dtype.str}:{x.shape[1:]}".encode()
+        keys = [hashlib.blake2b(prefix + row.tobytes(), digest_size=16).digest() for row in x]
+
+        with self._lock:
+            found = [self._get(key) for key in keys]
+            missing = {}
+            for i, (key, probabilities) in enumerate(zip(keys, found)):
+                if probabilities is None:
+                    missing.setdefault(key, i)
+            # duplicates of a missing row within the batch are scored once, so they count as hits
+            self.hits += len(keys) - len(missing)
+
+        if missing:
+            rows = list(missing.values())
+            predicted = self.model.predict_proba(x[rows], batch_size=batch_size, verbose=verbose)
+            with self._lock:
+                self.misses += len(rows)
+                self._put(list(missing), predicted)
+            predicted = dict(zip(missing, predicted))
+            found = [predicted[key] if probabilities is None else probabilities for key, probabilities in zip(keys, found)]
+
+        if not found:
+            return self.model.predict_proba(x, batch_size=batch_size, verbose=verbose)
+        return np.stack(found)
+
+    def stats(self) -> dict:
+        """
+        Gets the cache counters.
+
+        Returns:
+            dict: The 'hits' (including 'disk_hits'), 'misses', 'hit_rate',
+                'entries' and 'bytes' of the cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes
+        }
+
+    def close(self) -> None:
+        """
+        Closes the persistent tier.
+        """
+        if self._db is not None:
+            self._db.commit()
+            self._db.close()
+            self._db = None
+
+    def _get(self, key: bytes) -> np.ndarray | None:
+        """
+        Helper method. Looks a key up in the memory tier, then the persistent tier.
+        """
+        probabilities = self._entries.get(key)
+        if probabilities is not None:
+            self._entries.move_to_end(key)
+            return probabilities
+        if self._db is not None:
+            row = self._db.execute("SELECT probabilities FROM predictions WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                probabilities = np.frombuffer(row[0], dtype=np.float32)
+                self.disk_hits += 1
+                self._remember(key, probabilities)
+                return probabilities
+        return None
+
+    def _put(self, keys: list, probabilities: np.ndarray) -> None:
+        """
+        Helper method. Stores the predictions of a batch in both tiers, with a
+        single insert and commit in the persistent tier.
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float32)
+        for key, row in zip(keys, probabilities):
+            self._remember(key, row)
+        if self._db is not None:
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO predictions VALUES (?, ?)", zip(keys, (row.tobytes() for row in probabilities))
+                )
+
+    def _remember(self, key: bytes, probabilities: np.ndarray) -> None:
+        """
+        Helper method. Stores a prediction in the memory tier and evicts the
+        least recently used entries beyond the memory budget.
+        """
+        if key in self._entries:
+            return
+        self._entries[key] = probabilities
+        self._bytes += probabilities.nbytes + len(key) + self.ENTRY_OVERHEAD_BYTES
+        while self._bytes > self.max_bytes and self._entries:
+            old_key, old_probabilities = self._entries.popitem(last=False)
+            self._bytes -= old_probabilities.nbytes + len(old_key) + self.ENTRY_OVERHEAD_BYTES
+
+
+def model_fingerprint(model) -> str:
+    """
+    Hashes the identity of a model from its class and weights.
+
+    Args:
+        model (BaseModel | NumpyModel): The model.
+    Returns:
+        str: The model fingerprint.
+    """
+    if hasattr(model, "layers"):
+        weights = [weight for _, params in model.layers for weight in params]
+    else:
+        weights = model.model.get_weights()
+    digest = hashlib.blake2b(type(model).__name__.encode(), digest_size=16)
+    for weight in weights:
+        digest.update(str(weight.shape).encode())
+        digest.update(np.ascontiguousarray(weight).tobytes())
+    return digest.hexdigest()
+
+
+def _snapshot(keys: list) -> str:
+    """
+    Helper function. Hashes the (path, size, mtime, type) keys of a corpus.
+
+    Args:
+        keys (list): The file keys.
+    Returns:
+        str: The corpus snapshot digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for key in keys:
+        digest.update(repr(key).encode())
+    return digest.hexdigest()
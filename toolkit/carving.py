@@ -0,0 +1,114 @@
+import os
+import mmap
+import time
+
+from typing import Iterator
+
+import numpy as np
+
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .models_interface import BaseModel
+from .inference import model_timesteps
+from .utils import BLOCK_SIZE_BYTES, block_features, convert_num2cat
+
+
+def scan_image(
+    path: str,
+    model: BaseModel,
+    block_size: int=BLOCK_SIZE_BYTES,
+    stride: int | None=None,
+    offset: int=0,
+    batch_size: int=1024,
+    stats: dict | None=None
+) -> Iterator[tuple]:
+    """
+    Classifies every cluster of a raw disk image, unallocated space dump or any
+    large file, and merges consecutive clusters of the same type into segments.
+    The file is memory-mapped and windows are zero-copy views read sequentially,
+    so files larger than RAM are scanned at sequential read speed.
+
+    Args:
+        path (str): The path of the image.
+        model (BaseModel): A trained model, or a NumpyModel.
+        block_size (int): The window size in bytes, the cluster size of the image.
+        stride (int | None): The distance between windows, block_size if None.
+        offset (int): The offset of the first window, e.g. a partition start.
+        batch_size (int): The number of windows per prediction batch.
+        stats (dict | None): A dictionary updated after every batch with the
+            'windows', 'bytes', 'seconds' and 'mb_per_sec' counters.
+    Yields:
+        tuple: (start, end, type, confidence) segments, where end is exclusive and
+            confidence is the mean confidence of the merged windows.
+    """
+    stride = stride or block_size
+    if stats is None:
+        stats = {}
+    stats.update({"windows": 0, "bytes": 0, "seconds": 0.0, "mb_per_sec": 0.0})
+    start_time = time.perf_counter()
+
+    file_size = os.path.getsize(path)
+    if file_size <= offset:
+        return
+
+    with open(path, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+
+    try:
+        data = np.frombuffer(mapped, dtype=np.uint8)[offset:]
+        # window starts are built per batch, an array of every start would take 8 bytes per cluster
+        n_windows = -(-len(data) // stride)
+        n_full = (len(data) - block_size) // stride + 1 if len(data) >= block_size else 0
+        windows = sliding_window_view(data, block_size)[::stride] if n_full else None
+        timesteps = model_timesteps(model)
+
+        segment = None
+        for batch_start in range(0, n_windows, batch_size):
+            batch_starts = np.arange(batch_start, min(batch_start + batch_size, n_windows), dtype=np.int64) * stride
+            blocks = np.zeros((len(batch_starts), block_size), dtype=np.uint8)
+            full = min(max(n_full - batch_start, 0), len(batch_starts))
+            if full:
+                blocks[:full] = windows[batch_start:batch_start + full]
+            for i in range(full, len(batch_starts)):
+                tail = data[batch_starts[i]:batch_starts[i] + block_size]
+                blocks[i, :len(tail)] = tail
+            lengths = np.minimum(len(data) - batch_starts, block_size)
+
+            probabilities = model.predict_proba(block_features(blocks, lengths, timesteps), batch_size=batch_size, verbose=0)
+            classes = np.argmax(probabilities, axis=-1)
+            confidences = probabilities[np.arange(len(classes)), classes].astype(np.float64)
+
+            # runs of consecutive windows of the same class, broken by a class change or a gap between windows
+            window_starts = offset + batch_starts
+            window_ends = window_starts + lengths
+            breaks = np.flatnonzero((np.diff(classes) != 0) | (window_starts[1:] > window_ends[:-1])) + 1
+            run_starts = np.r_[0, breaks]
+            run_stops = np.r_[breaks, len(classes)]
+            run_confidences = np.add.reduceat(confidences, run_starts)
+
+            for first, last, confidence in zip(run_starts.tolist(), (run_stops - 1).tolist(), run_confidences.tolist()):
+                class_num, run_start, run_end, count = int(classes[first]), int(window_starts[first]), int(window_ends[last]), last - first + 1
+                if segment is not None and segment[2] == class_num and run_start <= segment[1]:
+                    segment[1] = run_end
+                    segment[3] += confidence
+                    segment[4] += count
+                    continue
+                if segment is not None:
+                    yield segment[0], segment[1], convert_num2cat(segment[2]), segment[3] / segment[4]
+                segment = [run_start, run_end, class_num, confidence, count]
+
+            stats["windows"] += len(batch_starts)
+            stats["bytes"] += int(lengths.sum())
+            stats["seconds"] = time.perf_counter() - start_time
+            stats["mb_per_sec"] = stats["bytes"] / 1024 ** 2 / stats["seconds"]
+
+        if segment is not None:
+            yield segment[0], segment[1], convert_num2cat(segment[2]), segment[3] / segment[4]
+    finally:
+        data = windows = tail = None
+        try:
+            mapped.close()
+        except BufferError:
+            pass
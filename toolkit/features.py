@@ -0,0 +1,225 @@
+import os
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .profiling import instrument
+from .utils import BLOCK_SIZE_BYTES, _block_offset, _read_file_blocks, byte_frequency_histograms, block_features
+
+
+PRINTABLE_BYTES = np.zeros(256, dtype=bool)
+PRINTABLE_BYTES[32:127] = True
+PRINTABLE_BYTES[[9, 10, 13]] = True
+
+FEATURES = ("histogram", "bigrams", "entropy", "printable_ratio", "longest_run", "longest_run_byte", "mean_run")
+
+
+@instrument("featurize.extract_features", batch_arg=0)
+def extract_features(blocks: np.ndarray, lengths: np.ndarray | None=None, bigram_bins: int=4096, chunk_size: int=1024) -> dict:
+    """
+    Computes the byte frequency histogram, hashed byte-bigram counts, Shannon
+    entropy, printable ASCII ratio and run-length statistics of many blocks.
+    Every feature is computed for a whole chunk of blocks with offset bincounts
+    over flattened indices, and chunks bound the size of the temporary arrays.
+
+    Args:
+        blocks (np.ndarray): A (n, block_size) uint8 array, e.g. a BlockCache
+            block column or read_blocks output.
+        lengths (np.ndarray | None): The number of valid bytes of each block,
+            bytes past it are ignored. All bytes are used if None.
+        bigram_bins (int): The number of bins byte bigrams are hashed into.
+        chunk_size (int): The number of blocks processed at a time.
+    Returns:
+        dict: The 'histogram' (n, 256) and 'bigrams' (n, bigram_bins) counts, and
+            the (n,) 'entropy' in bits, 'printable_ratio', 'longest_run' of a
+            repeated byte, 'longest_run_byte' and 'mean_run' length. The
+            'longest_run_byte' of an empty block is -1.
+    """
+    n, block_size = blocks.shape
+    if lengths is None:
+        lengths = np.full(n, block_size)
+    lengths = np.minimum(np.asarray(lengths), block_size)
+
+    features = {
+        "histogram": np.zeros((n, 256), dtype=np.int32),
+        "bigrams": np.zeros((n, bigram_bins), dtype=np.int32),
+        "entropy": np.zeros(n, dtype=np.float32),
+        "printable_ratio": np.zeros(n, dtype=np.float32),
+        "longest_run": np.zeros(n, dtype=np.int32),
+        "longest_run_byte": np.zeros(n, dtype=np.int32),
+        "mean_run": np.zeros(n, dtype=np.float32)
+    }
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        _chunk_features(blocks[start:stop], lengths[start:stop], bigram_bins, {name: values[start:stop] for name, values in features.items()})
+    return features
+
+
+def _chunk_features(blocks: np.ndarray, lengths: np.ndarray, bigram_bins: int, out: dict) -> None:
+    """
+    Helper function. Computes the features of a chunk of blocks into the output views.
+    """
+    n, block_size = blocks.shape
+    rows = np.arange(n, dtype=np.int64)[:, None]
+    valid_counts = np.maximum(lengths, 1)
+
+    histogram = byte_frequency_histograms(blocks, lengths)
+    out["histogram"][:] = histogram
+
+    # hashed bigrams: a pair is valid when both of its bytes are
+    pairs = (blocks[:, :-1].astype(np.uint64) << np.uint64(8)) | blocks[:, 1:]
+    hashed = ((pairs * np.uint64(2654435761)) >> np.uint64(16)) % np.uint64(bigram_bins)
+    pair_valid = np.arange(block_size - 1) < (lengths - 1)[:, None]
+    offsets = hashed.astype(np.int64) + rows * bigram_bins
+    out["bigrams"][:] = np.bincount(offsets[pair_valid], minlength=n * bigram_bins).reshape(n, bigram_bins)
+
+    probabilities = histogram / valid_counts[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["entropy"][:] = -np.where(probabilities > 0, probabilities * np.log2(probabilities), 0).sum(axis=1)
+    out["printable_ratio"][:] = histogram[:, PRINTABLE_BYTES].sum(axis=1) / valid_counts
+
+    # runs of a repeated byte: a run starts at every byte differing from the previous
+    # one and at every row start, and is clipped to the valid bytes of its row
+    flat = blocks.ravel()
+    starts_mask = np.ones(flat.shape, dtype=bool)
+    starts_mask[1:] = flat[1:] != flat[:-1]
+    starts_mask[::block_size] = True
+    starts = np.flatnonzero(starts_mask)
+    run_ends = np.append(starts[1:], flat.size)
+    run_rows = starts // block_size
+    valid_ends = run_rows * block_size + lengths[run_rows]
+    run_lengths = np.clip(np.minimum(run_ends, valid_ends) - starts, 0, None)
+
+    row_starts = np.searchsorted(starts, np.arange(n) * block_size)
+    longest = np.maximum.reduceat(run_lengths, row_starts)
+    out["longest_run"][:] = longest
+
+    # the first run of each row reaching the row maximum
+    is_longest = run_lengths == longest[run_rows]
+    first_longest = starts[np.flatnonzero(is_longest)[np.searchsorted(run_rows[is_longest], np.arange(n))]]
+    # cast before the sentinel, a uint8 result would wrap -1 to 255 under NumPy 2
+    out["longest_run_byte"][:] = np.where(lengths > 0, flat[first_longest].astype(np.int32), -1)
+
+    run_counts = np.bincount(run_rows[run_lengths > 0], minlength=n)
+    out["mean_run"][:] = lengths / np.maximum(run_counts, 1)
+
+
+@instrument("featurize.build_features", batch_arg=0)
+def build_features(
+    paths: list,
+    blocks: tuple=("first",),
+    block_size: int=BLOCK_SIZE_BYTES,
+    timesteps: int=BLOCK_SIZE_BYTES,
+    n_workers: int | None=None,
+    shard_size: int=1024
+) -> tuple[np.ndarray, np.ndarray, dict]:
+    """
+    Reads blocks and builds model inputs with a pool of processes, replacing the
+    per-row DataFrame.apply of get_1st_block_bytes, pad_array and
+    byte_frequency_histogram. Each worker takes shards of the file list and
+    writes its features and byte counts straight into result matrices held in
+    shared memory, so no array is pickled back to the parent process. The
+    returned arrays are backed by the shared memory itself instead of copies of
+    it, and the segments are freed with the last array using them. Workers are
+    spawned, so scripts calling it need an if __name__ == "__main__" guard.
+
+    Args:
+        paths (list): The paths of the targeted files.
+        blocks (tuple): Block selectors as in read_blocks.
+        block_size (int): The block size in bytes.
+        timesteps (int): The timesteps of the model as in block_features, 256 for
+            byte frequency histograms and padded byte integers otherwise.
+        n_workers (int | None): The number of worker processes, one per core if None.
+        shard_size (int): The number of files per task.
+    Returns:
+        tuple[np.ndarray, np.ndarray, dict]: The (n_files, n_blocks, timesteps)
+            features, int32 histograms or uint16 padded bytes, the (n_files, n_blocks)
+            byte counts, and a dictionary mapping the index of each failed file to
+            its error. The rows of failed files are left at zero.
+    """
+    selectors = tuple(blocks)
+    for selector in selectors:
+        _block_offset(selector, 0, block_size)
+
+    n = len(paths)
+    dtype = np.dtype(np.int32) if timesteps == 256 else np.dtype(np.uint16)
+    shapes = {"features": ((n, len(selectors), timesteps), dtype), "lengths": ((n, len(selectors)), np.dtype(np.int32))}
+    segments = {
+        name: shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+        for name, (shape, dtype) in shapes.items()
+    }
+    completed = False
+    try:
+        specs = {name: (segments[name].name, shape, dtype.str) for name, (shape, dtype) in shapes.items()}
+        errors = {}
+        n_workers = n_workers or os.cpu_count() or 1
+        # spawned workers stay safe when the parent process has TensorFlow threads running
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [
+                executor.submit(_build_shard, specs, start, paths[start:start + shard_size], selectors, block_size, timesteps)
+                for start in range(0, n, shard_size)
+            ]
+            for future in futures:
+                errors.update(future.result())
+
+        # the names are removed right away, the mappings stay valid until the arrays are collected
+        features, lengths = (np.asarray(_SharedBuffer(segments[name], shape, dtype)) for name, (shape, dtype) in shapes.items())
+        completed = True
+    finally:
+        for segment in segments.values():
+            if not completed:
+                segment.close()
+            segment.unlink()
+    return features, lengths, errors
+
+
+class _SharedBuffer:
+    def __init__(self, segment: shared_memory.SharedMemory, shape: tuple, dtype: np.dtype):
+        """
+        Helper class. Exposes a shared memory segment to NumPy as the base of the
+        arrays using it, and closes the segment when the last of them is collected.
+        """
+        self.segment = segment
+        self.view = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+        self.__array_interface__ = self.view.__array_interface__
+
+    def __del__(self):
+        # the view exports the segment buffer, so it is released before closing
+        self.view = None
+        self.segment.close()
+
+
+def _build_shard(specs: dict, start: int, paths: list, selectors: tuple, block_size: int, timesteps: int) -> dict:
+    """
+    Helper function. Reads and featurizes a shard of files in a worker process,
+    writing the rows of the shared result matrices.
+    """
+    segments = {name: shared_memory.SharedMemory(name=segment_name) for name, (segment_name, _, _) in specs.items()}
+    try:
+        views = {
+            name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=segments[name].buf)
+            for name, (_, shape, dtype) in specs.items()
+        }
+        out = np.zeros((len(paths), len(selectors), block_size), dtype=np.uint8)
+        lengths = np.zeros((len(paths), len(selectors)), dtype=np.int32)
+        errors = {}
+        for i, path in enumerate(paths):
+            try:
+                _read_file_blocks(path, selectors, out[i], lengths[i], block_size)
+            except OSError as e:
+                out[i] = 0
+                lengths[i] = 0
+                errors[start + i] = e
+
+        stop = start + len(paths)
+        for j in range(len(selectors)):
+            views["features"][start:stop, j] = block_features(out[:, j], lengths[:, j], timesteps)
+        views["lengths"][start:stop] = lengths
+        del views
+        return errors
+    finally:
+        for segment in segments.values():
+            segment.close()
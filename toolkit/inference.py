@@ -0,0 +1,368 @@
+import os
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+
+import numpy as np
+
+from .models_interface import BaseModel
+from .signatures import match_signatures
+from .utils import BLOCK_SIZE_BYTES, read_blocks, read_blocks_parallel, block_features, convert_num2cat
+
+
+def scan_tree(root: str) -> Iterator[str]:
+    """
+    Lazily yields the paths of the regular files under a directory tree.
+
+    Args:
+        root (str): The root directory.
+    Yields:
+        str: A file path.
+    """
+    directories = [root]
+    while directories:
+        directory = directories.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry.path
+        except OSError:
+            continue
+
+
+def model_timesteps(model: BaseModel) -> int:
+    """
+    Gets the number of timesteps a model expects.
+
+    Args:
+        model (BaseModel): The model, or a NumpyModel.
+    Returns:
+        int: The input timesteps.
+    """
+    return model.input_shape[1]
+
+
+def predict_blocks(model: BaseModel, blocks: np.ndarray, lengths: np.ndarray, batch_size: int=256) -> np.ndarray:
+    """
+    Predicts class probabilities for files from one or more of their blocks.
+    The probabilities of the non-empty blocks of a file are averaged.
+
+    Args:
+        model (BaseModel): A trained model.
+        blocks (np.ndarray): A (n_files, n_blocks, block_size) uint8 array.
+        lengths (np.ndarray): The (n_files, n_blocks) number of valid bytes.
+        batch_size (int): The prediction batch size.
+    Returns:
+        np.ndarray: A (n_files, n_classes) array, all zeros for empty files.
+    """
+    n_files, n_blocks, block_size = blocks.shape
+    features = block_features(blocks.reshape(-1, block_size), lengths.reshape(-1), model_timesteps(model))
+    probabilities = model.predict_proba(features, batch_size=batch_size, verbose=0)
+    probabilities = probabilities.reshape(n_files, n_blocks, -1)
+
+    weights = (lengths > 0).astype(probabilities.dtype)
+    counts = np.maximum(weights.sum(axis=1, keepdims=True), 1)
+    return (probabilities * weights[..., None]).sum(axis=1) / counts
+
+
+def classify_tree(
+    root: str,
+    model: BaseModel,
+    blocks: tuple=("first",),
+    batch_size: int=256,
+    block_size: int=BLOCK_SIZE_BYTES,
+    max_workers: int=8,
+    max_in_flight: int=64,
+    stats: dict | None=None
+) -> Iterator[tuple]:
+    """
+    Classifies every file under a directory tree. Paths are streamed from
+    os.scandir, blocks are read concurrently, and the next batch is read while
+    the model predicts the current one.
+
+    Args:
+        root (str): The root directory.
+        model (BaseModel): A trained model.
+        blocks (tuple): Block selectors as in read_blocks; the predictions of
+            several blocks are averaged.
+        batch_size (int): The number of files per prediction batch.
+        block_size (int): The block size in bytes.
+        max_workers (int): The number of reader threads.
+        max_in_flight (int): The maximum number of files being read at once.
+        stats (dict | None): A dictionary updated after every batch with the
+            'files', 'errors', 'bytes', 'seconds' and 'files_per_sec' counters.
+    Yields:
+        tuple: (path, type, confidence) records, with a None type and a 0.0
+            confidence for files that could not be read or are empty.
+    """
+    if stats is None:
+        stats = {}
+    stats.update({"files": 0, "errors": 0, "bytes": 0, "seconds": 0.0, "files_per_sec": 0.0})
+    start = time.perf_counter()
+
+    def read(batch: list) -> tuple:
+        return (batch, *read_blocks_parallel(batch, blocks, block_size, max_workers=max_workers, max_in_flight=max_in_flight))
+
+    batches = _batched(scan_tree(root), batch_size)
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        batch = next(batches, None)
+        pending = prefetcher.submit(read, batch) if batch else None
+        while pending is not None:
+            paths, block_bytes, lengths, errors = pending.result()
+            batch = next(batches, None)
+            pending = prefetcher.submit(read, batch) if batch else None
+
+            probabilities = predict_blocks(model, block_bytes, lengths, batch_size)
+            classes = np.argmax(probabilities, axis=-1)
+            confidences = probabilities[np.arange(len(paths)), classes]
+            for i, path in enumerate(paths):
+                if i in errors or confidences[i] == 0:
+                    yield path, None, 0.0
+                else:
+                    yield path, convert_num2cat(int(classes[i])), float(confidences[i])
+
+            stats["files"] += len(paths)
+            stats["errors"] += len(errors)
+            stats["bytes"] += int(lengths.sum())
+            stats["seconds"] = time.perf_counter() - start
+            stats["files_per_sec"] = stats["files"] / stats["seconds"]
+
+
+class CascadeClassifier:
+    def __init__(self, model: BaseModel, batch_size: int=256):
+        """
+        A two stage classifier. The first stage matches the magic numbers of the
+        first blocks and decides right away when a signature identifies a single
+        type. The leftovers (text formats, OLE2 documents, blocks without a known
+        header) go to the model, whose predictions are restricted to the types
+        the first stage left open. Every stage keeps its throughput counters.
+
+        Args:
+            model (BaseModel): A trained first block model, or a NumpyModel.
+            batch_size (int): The model prediction batch size.
+        """
+        self.model = model
+        self.batch_size = batch_size
+        self.stats = {
+            "signatures": {"files": 0, "decided": 0, "seconds": 0.0},
+            "model": {"files": 0, "decided": 0, "seconds": 0.0}
+        }
+
+    def classify(self, blocks: np.ndarray, lengths: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Classifies first blocks.
+
+        Args:
+            blocks (np.ndarray): A (n, block_size) uint8 array of first blocks.
+            lengths (np.ndarray): The number of valid bytes of each block.
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: The classes, the confidences,
+                and the stage that decided each block, 0 for the signatures and 1
+                for the model. Empty blocks get class 0 with confidence 0.0 at
+                stage 0, without reaching the model.
+        """
+        start = time.perf_counter()
+        classes, candidates = match_signatures(blocks, lengths)
+        confidences = (classes > 0).astype(np.float32)
+        empty = np.asarray(lengths) == 0
+        stages = np.where((classes > 0) | empty, 0, 1)
+        self._count("signatures", len(blocks), int(((classes > 0) | empty).sum()), start)
+
+        # the model would score the all-260 features of an empty block confidently
+        rest = np.flatnonzero((classes == 0) & ~empty)
+        if len(rest):
+            start = time.perf_counter()
+            features = block_features(blocks[rest], lengths[rest], model_timesteps(self.model))
+            probabilities = self.model.predict_proba(features, batch_size=self.batch_size, verbose=0)
+            probabilities = np.where(candidates[rest], probabilities, 0)
+            probabilities /= np.maximum(probabilities.sum(axis=-1, keepdims=True), 1e-12)
+            classes[rest] = np.argmax(probabilities, axis=-1)
+            confidences[rest] = probabilities[np.arange(len(rest)), classes[rest]]
+            self._count("model", len(rest), len(rest), start)
+        return classes, confidences, stages
+
+    def classify_files(self, paths: list, block_size: int=BLOCK_SIZE_BYTES) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Classifies files from their first block.
+
+        Args:
+            paths (list): The file paths.
+            block_size (int): The block size in bytes.
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: The classes, confidences and stages.
+        """
+        blocks, lengths = read_blocks(paths, ("first",), block_size)
+        return self.classify(blocks[:, 0], lengths[:, 0])
+
+    def report(self) -> dict:
+        """
+        Gets the share of files decided by each stage and its throughput.
+
+        Returns:
+            dict: The 'files', 'decided', 'seconds', 'share' and 'files_per_sec' of each stage.
+        """
+        total = self.stats["signatures"]["files"]
+        report = {}
+        for stage, counters in self.stats.items():
+            report[stage] = {
+                **counters,
+                "share": counters["decided"] / total if total else 0.0,
+                "files_per_sec": counters["files"] / counters["seconds"] if counters["seconds"] else 0.0
+            }
+        return report
+
+    def _count(self, stage: str, files: int, decided: int, start: float) -> None:
+        """
+        Helper method. Updates the counters of a stage.
+        """
+        self.stats[stage]["files"] += files
+        self.stats[stage]["decided"] += decided
+        self.stats[stage]["seconds"] += time.perf_counter() - start
+
+
+class ProgressiveClassifier:
+    def __init__(self, prefix_model: BaseModel, full_model: BaseModel, prefix_size: int=512, threshold: float=0.9, batch_size: int=256):
+        """
+        An early-exit classifier for latency-critical header classification. A
+        small model scores the first prefix_size bytes of every file, which
+        identify most header-bearing types, and only the files it is not
+        confident about are scored again by the full block model. classify_files
+        reads the rest of the block for those files only. Every path keeps its
+        counters, see report.
+
+        Args:
+            prefix_model (BaseModel): A model trained on the first prefix_size
+                bytes, e.g. Cnn(timesteps=512), or on their histograms with 256
+                timesteps.
+            full_model (BaseModel): A trained first block model.
+            prefix_size (int): The number of bytes scored first.
+            threshold (float): The prefix confidence below which the full block is scored.
+            batch_size (int): The model prediction batch size.
+        """
+        self.prefix_model = prefix_model
+        self.full_model = full_model
+        self.prefix_size = prefix_size
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.stats = {
+            "prefix": {"files": 0, "decided": 0, "bytes": 0, "seconds": 0.0},
+            "full": {"files": 0, "decided": 0, "bytes": 0, "seconds": 0.0}
+        }
+
+    def classify(self, blocks: np.ndarray, lengths: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Classifies first blocks already in memory, saving the compute of the full
+        model for the files decided from their prefix.
+
+        Args:
+            blocks (np.ndarray): A (n, block_size) uint8 array of first blocks.
+            lengths (np.ndarray): The number of valid bytes of each block.
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: The classes, the confidences,
+                and the path that decided each block, 0 for the prefix and 1 for
+                the full block. Empty blocks get class 0 and confidence 0.
+        """
+        lengths = np.asarray(lengths)
+        prefix_lengths = np.minimum(lengths, self.prefix_size)
+        return self._classify(blocks[:, :self.prefix_size], prefix_lengths, lambda rows: (blocks[rows], lengths[rows]))
+
+    def classify_files(self, paths: list, block_size: int=BLOCK_SIZE_BYTES) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Classifies files, reading prefix_size bytes of each one and the rest of
+        the first block only for the files the prefix model is not confident about.
+
+        Args:
+            paths (list): The file paths.
+            block_size (int): The block size in bytes.
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: The classes, confidences and paths.
+        """
+        prefixes, prefix_lengths = read_blocks(paths, ("first",), self.prefix_size)
+        prefixes, prefix_lengths = prefixes[:, 0], prefix_lengths[:, 0]
+
+        def load_rest(rows: np.ndarray) -> tuple:
+            blocks = np.zeros((len(rows), block_size), dtype=np.uint8)
+            blocks[:, :self.prefix_size] = prefixes[rows]
+            lengths = prefix_lengths[rows].copy()
+            # a file shorter than the prefix has been read entirely already
+            longer = np.flatnonzero(lengths == self.prefix_size)
+            if len(longer) and block_size > self.prefix_size:
+                rest, rest_lengths = read_blocks([paths[rows[i]] for i in longer], (self.prefix_size,), block_size - self.prefix_size)
+                blocks[longer, self.prefix_size:] = rest[:, 0]
+                lengths[longer] += rest_lengths[:, 0]
+            return blocks, lengths
+
+        return self._classify(prefixes, prefix_lengths, load_rest)
+
+    def report(self) -> dict:
+        """
+        Gets how often each path was taken and its throughput.
+
+        Returns:
+            dict: The 'files', 'decided', 'bytes', 'seconds', 'share' and
+                'files_per_sec' of each path.
+        """
+        total = self.stats["prefix"]["files"]
+        report = {}
+        for path, counters in self.stats.items():
+            report[path] = {
+                **counters,
+                "share": counters["decided"] / total if total else 0.0,
+                "files_per_sec": counters["files"] / counters["seconds"] if counters["seconds"] else 0.0
+            }
+        return report
+
+    def _classify(self, prefixes: np.ndarray, prefix_lengths: np.ndarray, load_rest) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Helper method. Scores the prefixes, then the full blocks returned by
+        load_rest for the rows below the threshold.
+        """
+        start = time.perf_counter()
+        features = block_features(prefixes, prefix_lengths, model_timesteps(self.prefix_model))
+        probabilities = self.prefix_model.predict_proba(features, batch_size=self.batch_size, verbose=0)
+        classes = np.argmax(probabilities, axis=-1)
+        confidences = probabilities[np.arange(len(classes)), classes].astype(np.float32)
+        empty = prefix_lengths == 0
+        classes[empty], confidences[empty] = 0, 0.0
+
+        rest = np.flatnonzero((confidences < self.threshold) & ~empty)
+        stages = np.zeros(len(classes), dtype=np.int64)
+        self._count("prefix", len(classes), len(classes) - len(rest), int(prefix_lengths.sum()), start)
+
+        if len(rest):
+            start = time.perf_counter()
+            blocks, lengths = load_rest(rest)
+            features = block_features(blocks, lengths, model_timesteps(self.full_model))
+            probabilities = self.full_model.predict_proba(features, batch_size=self.batch_size, verbose=0)
+            classes[rest] = np.argmax(probabilities, axis=-1)
+            confidences[rest] = probabilities[np.arange(len(rest)), classes[rest]]
+            stages[rest] = 1
+            self._count("full", len(rest), len(rest), int(lengths.sum()), start)
+        return classes, confidences, stages
+
+    def _count(self, path: str, files: int, decided: int, n_bytes: int, start: float) -> None:
+        """
+        Helper method. Updates the counters of a path.
+        """
+        self.stats[path]["files"] += files
+        self.stats[path]["decided"] += decided
+        self.stats[path]["bytes"] += n_bytes
+        self.stats[path]["seconds"] += time.perf_counter() - start
+
+
+def _batched(iterable, batch_size: int) -> Iterator[list]:
+    """
+    Helper function. Groups an iterable into lists of batch_size items.
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import os
+
+from array import array
+
+import numpy as np
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+from .utils import CLASS_NAMES
+from .splits import stratified_sample
+
+
+class Manifest:
+    def __init__(self, root: str, names: np.ndarray, offsets: np.ndarray, sizes: np.ndarray, mtimes: np.ndarray, type_codes: np.ndarray, type_names: list):
+        """
+        A columnar listing of a corpus, replacing the DataFrame the notebooks build
+        from get_file_types. Every column is a flat array: the relative paths are
+        one UTF-8 buffer split by offsets, the sizes and mtimes are int64 and the
+        file types are codes into a small table of interned extensions. A million
+        files take tens of MB instead of the GBs of object columns.
+        Build one with Manifest.scan, and index it with boolean masks or index
+        arrays, e.g. manifest[manifest.sizes > 16 * 1024].
+
+        Args:
+            root (str): The corpus directory the paths are relative to.
+            names (np.ndarray): The uint8 buffer of the UTF-8 relative paths.
+            offsets (np.ndarray): The n + 1 int64 offsets of the paths in names.
+            sizes (np.ndarray): The file sizes in bytes.
+            mtimes (np.ndarray): The file modification times in nanoseconds.
+            type_codes (np.ndarray): The index of each file type in type_names.
+            type_names (list): The interned file types, i.e. the extensions.
+        """
+        self.root = root
+        self.names = names
+        self.offsets = offsets
+        self.sizes = sizes
+        self.mtimes = mtimes
+        self.type_codes = type_codes
+        self.type_names = list(type_names)
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    def __getitem__(self, rows) -> "Manifest":
+        """
+        Selects rows with a boolean mask, an index array or a slice.
+
+        Returns:
+            Manifest: A manifest of the selected rows, sharing the type table.
+        """
+        rows = np.arange(len(self))[rows] if isinstance(rows, slice) else np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        starts, ends = self.offsets[rows], self.offsets[rows + 1]
+        lengths = ends - starts
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # gather the variable-length paths with a single fancy index
+        gather = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return Manifest(self.root, self.names[gather], offsets, self.sizes[rows], self.mtimes[rows], self.type_codes[rows], self.type_names)
+
+    @classmethod
+    def scan(cls, root: str) -> "Manifest":
+        """
+        Lists every file under root with os.scandir, calling stat once per file.
+        Directories are visited in name order so the row order, and therefore
+        seeded sampling, does not depend on the file system.
+
+        Args:
+            root (str): The corpus directory.
+        Returns:
+            Manifest: The corpus manifest.
+        """
+        names, offsets = bytearray(), array("q", [0])
+        sizes, mtimes, type_codes = array("q"), array("q"), array("H")
+        type_table = {}
+        prefix = len(os.path.join(root, ""))
+
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+            except OSError:
+                continue
+            subdirectories = []
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(entry.path)
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                names += entry.path[prefix:].encode("utf-8", "surrogateescape")
+                offsets.append(len(names))
+                sizes.append(stat.st_size)
+                mtimes.append(stat.st_mtime_ns)
+                file_type = os.path.splitext(entry.name)[1][1:]
+                type_codes.append(type_table.setdefault(file_type, len(type_table)))
+            stack.extend(reversed(subdirectories))
+
+        return cls(
+            root,
+            np.frombuffer(names, dtype=np.uint8).copy(),
+            np.frombuffer(offsets, dtype=np.int64).copy(),
+            np.frombuffer(sizes, dtype=np.int64).copy(),
+            np.frombuffer(mtimes, dtype=np.int64).copy(),
+            np.frombuffer(type_codes, dtype=np.uint16).copy(),
+            list(type_table)
+        )
+
+    def save(self, path: str) -> None:
+        """
+        Saves the manifest as an uncompressed .npz file, loaded back without parsing.
+
+        Args:
+            path (str): The output file.
+        """
+        np.savez(
+            path,
+            root=np.array(self.root),
+            names=self.names,
+            offsets=self.offsets,
+            sizes=self.sizes,
+            mtimes=self.mtimes,
+            type_codes=self.type_codes,
+            type_names=np.array(self.type_names, dtype=str)
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "Manifest":
+        """
+        Loads a manifest saved with Manifest.save.
+
+        Args:
+            path (str): The .npz file.
+        Returns:
+            Manifest: The manifest.
+        """
+        with np.load(path) as data:
+            return cls(
+                str(data["root"]), data["names"], data["offsets"], data["sizes"], data["mtimes"], data["type_codes"], data["type_names"].tolist()
+            )
+
+    def path(self, row: int) -> str:
+        """
+        Gets the relative path of a file.
+
+        Args:
+            row (int): The row of the file.
+        Returns:
+            str: The path relative to the root.
+        """
+        return self.names[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8", "surrogateescape")
+
+    def paths(self, absolute: bool=True) -> list:
+        """
+        Gets the paths of every file, e.g. for read_blocks or BlockCache.build.
+
+        Args:
+            absolute (bool): True to join the paths to the root.
+        Returns:
+            list: The paths.
+        """
+        buffer = self.names.tobytes()
+        paths = [buffer[start:end].decode("utf-8", "surrogateescape") for start, end in zip(self.offsets[:-1].tolist(), self.offsets[1:].tolist())]
+        if absolute:
+            return [os.path.join(self.root, path) for path in paths]
+        return paths
+
+    @property
+    def types(self) -> np.ndarray:
+        """
+        The file type of every file.
+        """
+        return np.array(self.type_names, dtype=str)[self.type_codes]
+
+    def type_mask(self, types: list) -> np.ndarray:
+        """
+        Masks the files of some types.
+
+        Args:
+            types (list): The file types.
+        Returns:
+            np.ndarray: True for the files of one of the types.
+        """
+        codes = [code for code, name in enumerate(self.type_names) if name in set(types)]
+        return np.isin(self.type_codes, codes)
+
+    def filter(self, types: list | None=None, min_size: int | None=None, max_size: int | None=None) -> "Manifest":
+        """
+        Keeps the files of some types and sizes, e.g. the notebooks' targeted types
+        larger than 16KB with filter(CLASS_NAMES, min_size=16 * 1024 + 1).
+
+        Args:
+            types (list | None): The file types to keep, all of them if None.
+            min_size (int | None): The minimum size in bytes.
+            max_size (int | None): The maximum size in bytes.
+        Returns:
+            Manifest: The filtered manifest.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if types is not None:
+            mask &= self.type_mask(types)
+        if min_size is not None:
+            mask &= self.sizes >= min_size
+        if max_size is not None:
+            mask &= self.sizes <= max_size
+        return self[mask]
+
+    def classes(self, class_names: list=CLASS_NAMES) -> np.ndarray:
+        """
+        Maps the file types to numerical classes, as convert_cat2num does.
+
+        Args:
+            class_names (list): The file type of each class, starting at class 1.
+        Returns:
+            np.ndarray: The classes, 0 for the other types.
+        """
+        table = np.array([class_names.index(name) + 1 if name in class_names else 0 for name in self.type_names], dtype=np.int64)
+        return table[self.type_codes]
+
+    def counts(self) -> dict:
+        """
+        Counts the files of each type, like df["type"].value_counts().
+
+        Returns:
+            dict: The number of files of each type, most frequent first.
+        """
+        counts = np.bincount(self.type_codes, minlength=len(self.type_names))
+        return {self.type_names[code]: int(counts[code]) for code in np.argsort(-counts, kind="stable") if counts[code]}
+
+    def sample(self, n: int=2000, exempt: tuple=("png",), seed: int=42) -> "Manifest":
+        """
+        Samples up to n files of each type, like the notebooks' groupby sampling,
+        keeping every file of the exempt types.
+
+        Args:
+            n (int): The maximum number of files per type.
+            exempt (tuple): The types whose files are all kept.
+            seed (int): The sampling seed.
+        Returns:
+            Manifest: The sampled manifest, in the original row order.
+        """
+        exempt_codes = tuple(code for code, name in enumerate(self.type_names) if name in exempt)
+        return self[stratified_sample(self.type_codes, n, exempt=exempt_codes, seed=seed)]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Builds the DataFrame of the notebooks, with the 'file', 'type' and 'size KB' columns.
+
+        Returns:
+            pd.DataFrame: The manifest as a DataFrame.
+        """
+        import pandas as pd
+
+        return pd.DataFrame({
+            "file": self.paths(absolute=False),
+            "type": pd.Categorical.from_codes(self.type_codes.astype(np.int64), self.type_names),
+            "size KB": self.sizes / 1024
+        })
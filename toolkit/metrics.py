@@ -1,6 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 
 
 def evaluate_performance(y_true: np.ndarray, y_pred: np.ndarray) -> dict:
@@ -15,6 +13,8 @@ def evaluate_performance(y_true: np.ndarray, y_pred: np.ndarray) -> dict:
     Returns:
         dict: a dictionary containing the accuracy, precision, recall, and f1-score.
     """
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+
     accuracy = accuracy_score(y_true, y_pred)
     precision = precision_score(y_true, y_pred, average='macro')
     recall = recall_score(y_true, y_pred, average='macro')
@@ -36,6 +36,8 @@ def plot_confusion_matrix(cm: np.ndarray, class_names: list) -> None:
         cm (np.ndarray): The confusion matrix.
         class_names (list): The class names.
     """
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=(8, 8))
     cax = ax.matshow(cm, cmap='viridis')
     plt.colorbar(cax)
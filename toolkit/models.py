@@ -2,12 +2,11 @@ import keras
 
 import numpy as np
 import tensorflow as tf
-import matplotlib.pyplot as plt
 
-from keras.models import Sequential # type: ignore
-from keras.layers import LSTM, Conv1D, MaxPooling1D, GRU, Dense, Bidirectional, Flatten, Input, Dropout # type: ignore
+from keras.models import Sequential, Model # type: ignore
+from keras.layers import LSTM, Conv1D, MaxPooling1D, GRU, Dense, Bidirectional, Flatten, Input, Dropout, Concatenate # type: ignore
 
-from .models_interface import BaseModel
+from .models_interface import BaseModel, FusedModel
 
 
 class Ffnn(BaseModel):
@@ -36,16 +35,27 @@ class Ffnn2(BaseModel):
 
     name = "Feed Forward Neural Network"
 
-    def __init__(self, timesteps: int=4096, features: int=1):
+    def __init__(
+        self,
+        timesteps: int=4096,
+        features: int=1,
+        units1: int=352,
+        units2: int=32,
+        add_layer: bool=False,
+        units3: int=32,
+        learning_rate: float=0.001
+    ):
+        hidden = [Dense(units1, activation='relu'), Dense(units2, activation='relu')]
+        if add_layer:
+            hidden.append(Dense(units3, activation='relu'))
         self.model = Sequential([
             Input(shape=(timesteps, features)),
-            Dense(352, activation='relu'),
-            Dense(32, activation='relu'),
+            *hidden,
             Flatten(),
             Dense(self.NUM_CLASSES, activation="softmax")
         ])
         self.model.compile(
-            optimizer=keras.optimizers.Adam(learning_rate=0.001), 
+            optimizer=keras.optimizers.Adam(learning_rate=learning_rate), 
             loss='sparse_categorical_crossentropy', 
             metrics=['accuracy']
         )
@@ -81,21 +91,30 @@ class Cnn2(BaseModel):
 
     name = "Convolutional Neural Network"
 
-    def __init__(self, timesteps: int=256, features: int=1):
+    def __init__(
+        self,
+        timesteps: int=256,
+        features: int=1,
+        filters1: int=64,
+        filters2: int=192,
+        dropout: float=0.3,
+        units: int=256,
+        learning_rate: float=0.001
+    ):
         self.model = Sequential([
             Input(shape=(timesteps, features)),
-            Conv1D(64, kernel_size=3, activation='relu'),
+            Conv1D(filters1, kernel_size=3, activation='relu'),
             MaxPooling1D(pool_size=2),
-            Conv1D(192, kernel_size=3, activation='relu'),
+            Conv1D(filters2, kernel_size=3, activation='relu'),
             MaxPooling1D(pool_size=2),
             Flatten(),
-            Dropout(0.3),
-            Dense(256, activation='relu'),
+            Dropout(dropout),
+            Dense(units, activation='relu'),
             Dense(self.NUM_CLASSES, activation='softmax')
         ])
 
         self.model.compile(
-            optimizer=keras.optimizers.Adam(learning_rate=0.001), 
+            optimizer=keras.optimizers.Adam(learning_rate=learning_rate), 
             loss='sparse_categorical_crossentropy', 
             metrics=['accuracy']
         )
@@ -140,4 +159,65 @@ class Lstm(BaseModel):
             metrics=['accuracy']
         )
 
-        self.model.summary()
\ No newline at end of file
+        self.model.summary()
+
+
+class FusedFfnn2(FusedModel):
+
+    name = "Fused Feed Forward Neural Network"
+
+    def __init__(self, timesteps: int=256, features: int=1):
+        inputs = [Input(shape=(timesteps, features), name=name) for name in self.INPUTS]
+        branches = [
+            Sequential([
+                Dense(352, activation='relu'),
+                Dense(32, activation='relu'),
+                Flatten()
+            ], name=f"{block}_branch")(block_input)
+            for block, block_input in zip(self.BLOCKS, inputs)
+        ]
+        first_output = Dense(self.NUM_CLASSES, activation="softmax", name=self.OUTPUTS[1])(branches[0])
+        fused = Dense(128, activation='relu')(Concatenate()(branches))
+        fused_output = Dense(self.NUM_CLASSES, activation="softmax", name=self.OUTPUTS[0])(fused)
+        self.model = Model(inputs=inputs, outputs={self.OUTPUTS[0]: fused_output, self.OUTPUTS[1]: first_output})
+
+        self.model.compile(
+            optimizer=keras.optimizers.Adam(learning_rate=0.001), 
+            loss={name: 'sparse_categorical_crossentropy' for name in self.OUTPUTS}, 
+            metrics={name: ['accuracy'] for name in self.OUTPUTS}
+        )
+
+        self.model.summary()
+
+
+class FusedCnn2(FusedModel):
+
+    name = "Fused Convolutional Neural Network"
+
+    def __init__(self, timesteps: int=256, features: int=1):
+        inputs = [Input(shape=(timesteps, features), name=name) for name in self.INPUTS]
+        branches = [
+            Sequential([
+                Conv1D(64, kernel_size=3, activation='relu'),
+                MaxPooling1D(pool_size=2),
+                Conv1D(192, kernel_size=3, activation='relu'),
+                MaxPooling1D(pool_size=2),
+                Flatten(),
+                Dropout(0.3)
+            ], name=f"{block}_branch")(block_input)
+            for block, block_input in zip(self.BLOCKS, inputs)
+        ]
+        first_output = Dense(self.NUM_CLASSES, activation="softmax", name=self.OUTPUTS[1])(
+            Dense(256, activation='relu')(branches[0])
+        )
+        fused = Dense(256, activation='relu')(Concatenate()(branches))
+        fused_output = Dense(self.NUM_CLASSES, activation="softmax", name=self.OUTPUTS[0])(fused)
+        self.model = Model(inputs=inputs, outputs={self.OUTPUTS[0]: fused_output, self.OUTPUTS[1]: first_output})
+
+        self.model.compile(
+            optimizer=keras.optimizers.Adam(learning_rate=0.001), 
+            loss={name: 'sparse_categorical_crossentropy' for name in self.OUTPUTS}, 
+            metrics={name: ['accuracy'] for name in self.OUTPUTS}
+        )
+
+        self.model.summary()
@@ -1,9 +1,15 @@
+from __future__ import annotations
+
+import os
 
 import numpy as np
-import tensorflow as tf
-import matplotlib.pyplot as plt
 
-from keras.src.callbacks import History
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from keras.callbacks import History
+
+from .profiling import instrument
 
 
 class BaseModel:
@@ -19,26 +25,242 @@ class BaseModel:
         self.features = features
         self.timesteps = timesteps
 
-    def fit(self, x: np.ndarray, y: np.ndarray, validation_data: tuple, epochs: int, batch_size: int) -> History:
+    @instrument("model.fit", batch_arg=1)
+    def fit(
+        self,
+        x,
+        y: np.ndarray | None=None,
+        validation_data: tuple | None=None,
+        epochs: int=1,
+        batch_size: int | None=32,
+        lengths: np.ndarray | None=None,
+        transform=None
+    ) -> History:
         """
-        This method trains the models.
+        This method trains the models. x is either an array, a memmap that is
+        streamed batch by batch, or a streaming source (tf.data.Dataset, generator
+        or PyDataset) yielding (x, y) batches, in which case y and batch_size are
+        ignored. validation_data follows the same rules, and a memmap validation
+        set is given as (x, y, lengths).
+
+        Raw uint8 blocks, e.g. cache.blocks[:, 0] or cache.blocks[train_idx, 0],
+        are given with their lengths, e.g. cache.lengths[:, 0]: batches are then
+        built with block_features, the 260-padded bytes or histograms served at
+        inference. transform, applied to the 260-padded batches instead, allows
+        other features. A memmap of raw blocks without either is refused.
         """
         if not hasattr(self, 'model'):
             raise AttributeError("Model has not been initialised.")
 
+        if isinstance(validation_data, tuple) and (isinstance(validation_data[0], np.memmap) or len(validation_data) > 2 or transform is not None):
+            validation_lengths = validation_data[2] if len(validation_data) > 2 else None
+            validation_data, _, _ = self._as_input(
+                validation_data[0], validation_data[1], batch_size, shuffle=False, lengths=validation_lengths, transform=transform
+            )
+        x, y, batch_size = self._as_input(x, y, batch_size, shuffle=True, lengths=lengths, transform=transform)
+
         self.history = self.model.fit(x=x, y=y, validation_data=validation_data, epochs=epochs, batch_size=batch_size)
         return self.history
     
-    def predict(self, x: np.ndarray) -> np.ndarray:
+    def predict(self, x, batch_size: int | None=32, lengths: np.ndarray | None=None, transform=None) -> np.ndarray:
         """
-        This method is for making predictions on unseen data.
+        This method is for making predictions on unseen data. x is either an
+        array, a memmap that is streamed batch by batch, or a streaming source
+        yielding x batches. lengths and transform follow the rules of fit.
         """
         if not hasattr(self, 'model'):
             raise AttributeError("Model has not been initialised.")
 
-        self.predictions = self.model.predict(x)
+        # only the models built on raw blocks take lengths and transform, e.g. not FusedModel
+        features = {name: value for name, value in (("lengths", lengths), ("transform", transform)) if value is not None}
+        self.predictions = self.predict_proba(x, batch_size=batch_size, **features)
         return np.argmax(self.predictions, axis=-1)
 
+    @instrument("model.predict", batch_arg=1)
+    def predict_proba(
+        self,
+        x,
+        batch_size: int | None=32,
+        verbose: str | int="auto",
+        lengths: np.ndarray | None=None,
+        transform=None
+    ) -> np.ndarray:
+        """
+        This method returns the class probabilities predicted on unseen data.
+        """
+        if not hasattr(self, 'model'):
+            raise AttributeError("Model has not been initialised.")
+
+        x, _, batch_size = self._as_input(x, None, batch_size, shuffle=False, lengths=lengths, transform=transform)
+        return self.model.predict(x, batch_size=batch_size, verbose=verbose)
+
+    def _as_input(
+        self,
+        x,
+        y: np.ndarray | None,
+        batch_size: int | None,
+        shuffle: bool,
+        lengths: np.ndarray | None=None,
+        transform=None
+    ) -> tuple:
+        """
+        Helper method. Wraps memmaps, and arrays given with lengths or a transform,
+        in a streaming dataset and drops the labels and batch size that streaming
+        sources provide themselves.
+        """
+        from .pipeline import block_dataset, is_stream
+
+        if lengths is not None or transform is not None:
+            if is_stream(x):
+                raise ValueError("lengths and transform apply to block arrays, streaming sources yield their own features.")
+            x = block_dataset(
+                x, y, lengths=lengths, batch_size=batch_size or 32, shuffle=shuffle and y is not None, transform=transform,
+                timesteps=self.input_shape[1] if lengths is not None and transform is None else None
+            )
+        elif isinstance(x, np.memmap):
+            if x.dtype == np.uint8:
+                # zeros past the end of short files would differ from the 260 padding served at inference
+                raise ValueError("A memmap of raw blocks needs its lengths, e.g. fit(cache.blocks[:, 0], y, lengths=cache.lengths[:, 0]).")
+            x = block_dataset(x, y, batch_size=batch_size or 32, shuffle=shuffle and y is not None)
+        if is_stream(x):
+            return x, None, None
+        return x, y, batch_size
+
+    @property
+    def input_shape(self) -> tuple:
+        """
+        The model input shape, (None, timesteps, features).
+        """
+        return self.model.input_shape
+
+    def export(self, path: str, verify: bool=True, x_probe: np.ndarray | None=None, atol: float=1e-4) -> None:
+        """
+        This method exports the model weights to a ".npz" file that toolkit.runtime.NumpyModel
+        runs without TensorFlow. Only Dense, Conv1D, MaxPooling1D, Flatten and Dropout
+        stacks are supported.
+
+        With verify, the exported model and the Keras model predict a probe batch,
+        x_probe or random byte values, and a ValueError is raised and the file
+        removed when their probabilities differ by more than atol, e.g. for a
+        layer setting the NumPy runtime does not reproduce.
+        """
+        from .runtime import export_model, NumpyModel
+
+        export_model(self.model, path)
+        if not verify:
+            return
+
+        path = path if path.endswith(".npz") else path + ".npz"
+        if x_probe is None:
+            rng = np.random.default_rng(0)
+            x_probe = rng.integers(0, 261, size=(32, *self.input_shape[1:])).astype(np.float32)
+        expected = self.model.predict(x_probe, batch_size=len(x_probe), verbose=0)
+        actual = NumpyModel.load(path).predict_proba(x_probe, batch_size=len(x_probe))
+        difference = float(np.max(np.abs(actual - expected)))
+        if difference > atol:
+            os.remove(path)
+            raise ValueError(f"The exported model differs from the Keras model by up to {difference:.3g}, more than {atol:.3g}.")
+
+    def quantize(self, mode: str, x_eval: np.ndarray, y_eval: np.ndarray, max_accuracy_drop: float | None=None, batch_size: int=256) -> tuple[BaseModel, dict]:
+        """
+        This method builds a quantized copy of the model for CPU inference and
+        measures its accuracy cost on held-out evaluation blocks.
+
+        "int8" is the dynamic, weight-only quantization of Keras: the Dense kernels
+        are stored in int8 with per-channel scales and the activations are
+        quantized at run time, so no calibration is done. Conv1D, GRU and LSTM
+        layers keep float32 weights, so Cnn, Gru and Lstm models shrink and speed
+        up little. "float16" and "bfloat16" compute in half precision while
+        keeping float32 variables.
+
+        Args:
+            mode (str): "int8", "float16" or "bfloat16".
+            x_eval (np.ndarray): Held-out features, not used for training.
+            y_eval (np.ndarray): Their classes.
+            max_accuracy_drop (float | None): The accuracy drop beyond which a
+                ValueError is raised, unbounded if None.
+            batch_size (int): The prediction batch size.
+        Returns:
+            tuple[BaseModel, dict]: The quantized model, and a report with the
+                evaluate_performance metrics of both models, the accuracy delta, the
+                prediction agreement, the files/sec and the weights size of both
+                models, and the "layer (class)" names of the layers with weights
+                left unquantized.
+        """
+        import time
+        import keras
+
+        from .metrics import evaluate_performance
+
+        if mode not in ("int8", "float16", "bfloat16"):
+            raise ValueError(f"Unknown quantization mode: {mode}.")
+
+        policy = {"int8": None, "float16": "mixed_float16", "bfloat16": "mixed_bfloat16"}[mode]
+
+        def clone_layer(layer):
+            config = layer.get_config()
+            if policy is not None:
+                config["dtype"] = policy
+            return layer.__class__.from_config(config)
+
+        clone = keras.models.clone_model(self.model, clone_function=clone_layer)
+        clone.set_weights(self.model.get_weights())
+        if mode == "int8":
+            clone.quantize("int8")
+
+        quantized = type(self).__new__(type(self))
+        quantized.model = clone
+
+        def is_quantized(layer) -> bool:
+            if mode == "int8":
+                return getattr(layer, "quantization_mode", None) == "int8"
+            return layer.compute_dtype == mode
+
+        report = {
+            "mode": mode,
+            "unquantized_layers": [
+                f"{layer.name} ({type(layer).__name__})" for layer in clone.layers if layer.weights and not is_quantized(layer)
+            ]
+        }
+        predictions = {}
+        for name, model in (("baseline", self), ("quantized", quantized)):
+            model.predict_proba(x_eval[:batch_size], batch_size=batch_size, verbose=0)
+            start = time.perf_counter()
+            probabilities = model.predict_proba(x_eval, batch_size=batch_size, verbose=0)
+            seconds = time.perf_counter() - start
+            predictions[name] = np.argmax(np.asarray(probabilities, dtype=np.float32), axis=-1)
+            report[name] = {
+                **evaluate_performance(y_eval, predictions[name]),
+                "files_per_sec": len(x_eval) / seconds if seconds else 0.0,
+                "weights_bytes": sum(np.asarray(weight).nbytes for weight in model.model.get_weights())
+            }
+        report["accuracy_delta"] = report["quantized"]["accuracy"] - report["baseline"]["accuracy"]
+        report["agreement"] = float(np.mean(predictions["baseline"] == predictions["quantized"]))
+
+        if max_accuracy_drop is not None and -report["accuracy_delta"] > max_accuracy_drop:
+            raise ValueError(f"The {mode} model loses {-report['accuracy_delta']:.4f} accuracy, more than {max_accuracy_drop}.")
+        return quantized, report
+
+    def save(self, path: str) -> None:
+        """
+        This method saves the trained model, e.g. to a ".keras" file.
+        """
+        if not hasattr(self, 'model'):
+            raise AttributeError("Model has not been initialised.")
+
+        self.model.save(path)
+
+    @classmethod
+    def load(cls, path: str) -> "BaseModel":
+        """
+        This method loads a saved model without building and compiling a new one.
+        """
+        import keras
+
+        instance = cls.__new__(cls)
+        instance.model = keras.models.load_model(path)
+        return instance
+
     def plot_learning_curves(self) -> None:
         """
         This method plots the model learning curves.
@@ -46,9 +268,147 @@ class BaseModel:
         if self.history is None:
             raise ValueError("Model has not been trained yet. Call `fit` method first.")
 
+        import matplotlib.pyplot as plt
+
         plt.plot(self.history.history['loss'])
         plt.plot(self.history.history['val_loss'])
         plt.title(f'{self.name} Learning Curve')
         plt.ylabel('Loss')
         plt.xlabel('Epoch')
         plt.legend(['training', 'validation'], loc='upper right')
+
+
+class FusedModel(BaseModel):
+    BLOCKS = ("first", "body", "last")
+    INPUTS = ("first_block", "body_block", "last_block")
+    OUTPUTS = ("fused_output", "first_output")
+    _first_model = None
+
+    def __init__(self, timesteps: int, features: int):
+        """
+        Abstract Class: extends the models that consume the first, body and last
+        blocks of a file together. Subclasses build a Keras model with one input
+        per block named after INPUTS, and two softmax outputs: "fused_output" over
+        all the blocks, and "first_output" over the first block alone so that
+        confident files can be classified without reading the other blocks.
+        """
+        super().__init__(timesteps, features)
+
+    @property
+    def first_model(self):
+        """
+        The sub-model scoring the first block alone.
+        """
+        if self._first_model is None:
+            import keras
+
+            self._first_model = keras.Model(
+                inputs=self.model.get_layer(self.INPUTS[0]).output,
+                outputs=self.model.get_layer(self.OUTPUTS[1]).output
+            )
+        return self._first_model
+
+    @property
+    def input_shape(self) -> tuple:
+        return self.first_model.input_shape
+
+    @instrument("model.fit", batch_arg=1)
+    def fit(self, x, y: np.ndarray | None=None, validation_data: tuple | None=None, epochs: int=1, batch_size: int | None=32) -> History:
+        """
+        This method trains both outputs of the models. x is a (n, 3, timesteps)
+        array, a list of the three block arrays, a dictionary keyed by INPUTS, or
+        a streaming source yielding such batches with dictionary labels.
+        """
+        from .pipeline import is_stream
+
+        if is_stream(x):
+            y, batch_size = None, None
+        else:
+            x, y = self._as_fused_input(x), self._as_fused_labels(y)
+        if isinstance(validation_data, tuple):
+            validation_data = (self._as_fused_input(validation_data[0]), self._as_fused_labels(validation_data[1]))
+
+        self.history = self.model.fit(x=x, y=y, validation_data=validation_data, epochs=epochs, batch_size=batch_size)
+        return self.history
+
+    @instrument("model.predict", batch_arg=1)
+    def predict_proba(self, x, batch_size: int | None=32, verbose: str | int="auto") -> np.ndarray:
+        """
+        This method returns the class probabilities predicted from all the blocks.
+        """
+        return self.model.predict(self._as_fused_input(x), batch_size=batch_size, verbose=verbose)[self.OUTPUTS[0]]
+
+    @instrument("model.predict_first", batch_arg=1)
+    def predict_first_proba(self, x: np.ndarray, batch_size: int | None=32, verbose: str | int="auto") -> np.ndarray:
+        """
+        This method returns the class probabilities predicted from the first block alone.
+        """
+        return self.first_model.predict(x, batch_size=batch_size, verbose=verbose)
+
+    def predict_early_exit(self, first: np.ndarray, load_rest, threshold: float=0.9, batch_size: int | None=32) -> tuple[np.ndarray, np.ndarray]:
+        """
+        This method scores the first blocks, and only loads and scores the body and
+        last blocks of the files whose first block prediction is not confident.
+
+        Args:
+            first (np.ndarray): The (n, timesteps) first block features.
+            load_rest (callable): Maps the indices of the ambiguous files to their
+                (body, last) block features.
+            threshold (float): The confidence needed to stop after the first block.
+            batch_size (int | None): The prediction batch size.
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The (n, n_classes) probabilities, and a
+                mask of the files classified from their first block alone.
+        """
+        probabilities = self.predict_first_proba(first, batch_size=batch_size, verbose=0)
+        exited = probabilities.max(axis=-1) >= threshold
+        rest = np.flatnonzero(~exited)
+        if len(rest):
+            body, last = load_rest(rest)
+            probabilities[rest] = self.predict_proba([first[rest], body, last], batch_size=batch_size, verbose=0)
+        return probabilities, exited
+
+    def classify_files(self, paths: list, threshold: float=0.9, batch_size: int | None=32) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        This method classifies files reading their first block only, and their body
+        and last blocks when the first block is not conclusive.
+
+        Args:
+            paths (list): The file paths.
+            threshold (float): The confidence needed to stop after the first block.
+            batch_size (int | None): The prediction batch size.
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: The classes, the confidences,
+                and a mask of the files classified from their first block alone.
+        """
+        from .utils import read_blocks, block_features
+
+        timesteps = self.input_shape[1]
+        first_blocks, first_lengths = read_blocks(paths, ("first",))
+        first = block_features(first_blocks[:, 0], first_lengths[:, 0], timesteps)
+
+        def load_rest(indices: np.ndarray) -> tuple:
+            blocks, lengths = read_blocks([paths[i] for i in indices], ("body", "last"))
+            return tuple(block_features(blocks[:, j], lengths[:, j], timesteps) for j in range(2))
+
+        probabilities, exited = self.predict_early_exit(first, load_rest, threshold, batch_size)
+        classes = np.argmax(probabilities, axis=-1)
+        return classes, probabilities[np.arange(len(classes)), classes], exited
+
+    def _as_fused_input(self, x) -> dict:
+        """
+        Helper method. Maps the block arrays to the model inputs.
+        """
+        if isinstance(x, dict):
+            return x
+        if isinstance(x, (list, tuple)):
+            return dict(zip(self.INPUTS, x))
+        return {name: x[:, i] for i, name in enumerate(self.INPUTS)}
+
+    def _as_fused_labels(self, y: np.ndarray) -> dict:
+        """
+        Helper method. Uses the classes as the labels of both outputs.
+        """
+        if isinstance(y, dict):
+            return y
+        return {name: y for name in self.OUTPUTS}
@@ -0,0 +1,94 @@
+import keras
+
+import numpy as np
+import tensorflow as tf
+
+from .utils import pad_blocks, block_features
+
+
+def block_dataset(
+    x: np.ndarray,
+    y: np.ndarray | None=None,
+    indices: np.ndarray | None=None,
+    lengths: np.ndarray | None=None,
+    batch_size: int=32,
+    shuffle: bool=False,
+    seed: int | None=None,
+    transform=None,
+    dtype: str="float32",
+    timesteps: int | None=None
+) -> tf.data.Dataset:
+    """
+    Builds a streaming dataset over a block matrix, typically a memmap such as
+    BlockCache.blocks, so that only one batch at a time is loaded in memory.
+    Batches are gathered lazily, padded and cast on the fly, in parallel and
+    prefetched while the model trains.
+
+    Args:
+        x (np.ndarray): A (n, timesteps) or (n, timesteps, features) array.
+        y (np.ndarray | None): The classes, None for prediction.
+        indices (np.ndarray | None): The rows to use, all of them if None.
+        lengths (np.ndarray | None): The number of valid bytes of each row. When
+            given, bytes past the length are replaced with the 260 pad value.
+        batch_size (int): The batch size.
+        shuffle (bool): True to shuffle the rows at every epoch.
+        seed (int | None): The shuffling seed.
+        transform (callable | None): A function applied to each NumPy batch after padding.
+        dtype (str): The dtype fed to the model.
+        timesteps (int | None): When given, rows are turned into model inputs with
+            block_features, histograms for 256 timesteps and 260-padded bytes
+            otherwise, exactly as at inference. Requires raw uint8 blocks.
+    Returns:
+        tf.data.Dataset: A dataset of x batches, or (x, y) batches when y is given.
+    """
+    if indices is None:
+        indices = np.arange(len(x))
+    indices = np.asarray(indices, dtype=np.int64)
+
+    def load(idx: np.ndarray) -> tuple:
+        batch = x[idx]
+        if timesteps is not None:
+            batch_lengths = lengths[idx] if lengths is not None else np.full(len(idx), batch.shape[1])
+            batch = block_features(batch, batch_lengths, timesteps)
+        elif lengths is not None:
+            batch = pad_blocks(batch, lengths[idx])
+        if transform is not None:
+            batch = transform(batch)
+        batch = np.asarray(batch, dtype=dtype)
+        if batch.ndim == 2:
+            batch = batch[..., np.newaxis]
+        if y is None:
+            return (batch,)
+        return batch, np.asarray(y[idx], dtype=np.int64)
+
+    tout = (tf.as_dtype(dtype),) if y is None else (tf.as_dtype(dtype), tf.int64)
+    # layers such as Flatten need the static row shape, which transform may change, so it is taken from a first row
+    row_shape = load(indices[:1])[0].shape[1:] if len(indices) else (None, None)
+
+    def load_batch(idx: tf.Tensor) -> tuple:
+        batch = tf.numpy_function(load, [idx], tout)
+        batch[0].set_shape((None, *row_shape))
+        if y is None:
+            return batch[0]
+        batch[1].set_shape((None,))
+        return batch[0], batch[1]
+
+    dataset = tf.data.Dataset.from_tensor_slices(indices)
+    if shuffle:
+        dataset = dataset.shuffle(len(indices), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size)
+    dataset = dataset.map(load_batch, num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def is_stream(x) -> bool:
+    """
+    Checks whether x is a streaming source that carries its own labels and
+    batching, i.e. a tf.data.Dataset, a Python generator or a keras PyDataset.
+
+    Args:
+        x: The model input.
+    Returns:
+        bool: True for a streaming source.
+    """
+    return isinstance(x, (tf.data.Dataset, keras.utils.PyDataset)) or hasattr(x, "__next__")
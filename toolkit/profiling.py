@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import cProfile
+import functools
+import threading
+
+from contextlib import contextmanager
+from typing import Iterator
+
+
+_enabled = False
+_tracing = False
+_lock = threading.Lock()
+_stats = {}
+_events = []
+# the stages running in each thread, with the time spent in their nested stages
+_stacks = threading.local()
+
+
+def instrument(stage: str, batch_arg: int | None=None):
+    """
+    Decorator timing and counting the calls of a pipeline stage. When profiling
+    is disabled the wrapper only checks a flag before calling the function.
+    Stages nested in another stage of the same thread are subtracted from its
+    self time.
+
+    Args:
+        stage (str): The stage name, e.g. "read.first_block".
+        batch_arg (int | None): The position of the argument whose length is
+            recorded in the batch-size histogram.
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            stack = _stack()
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                children = stack.pop()
+                if stack:
+                    stack[-1] += end - start
+            batch = args[batch_arg] if batch_arg is not None and len(args) > batch_arg else None
+            _record(stage, start, end, end - start - children, result, batch)
+            return result
+        return wrapper
+    return decorator
+
+
+def enable(trace: bool=False) -> None:
+    """
+    Enables the instrumentation.
+
+    Args:
+        trace (bool): True to also keep every call as a trace event.
+    """
+    global _enabled, _tracing
+    _enabled, _tracing = True, trace
+
+
+def disable() -> None:
+    """
+    Disables the instrumentation.
+    """
+    global _enabled, _tracing
+    _enabled, _tracing = False, False
+
+
+def reset() -> None:
+    """
+    Clears the collected statistics and trace events.
+    """
+    with _lock:
+        _stats.clear()
+        _events.clear()
+
+
+def get_stats() -> dict:
+    """
+    Gets the statistics of every stage.
+
+    Returns:
+        dict: The 'calls', 'seconds' including the nested stages, 'self_seconds'
+            excluding them, 'bytes' and 'batch_sizes' histogram of each stage,
+            whose buckets are the power-of-two upper bounds of the batch sizes.
+    """
+    with _lock:
+        return {stage: {**stats, "batch_sizes": dict(stats["batch_sizes"])} for stage, stats in _stats.items()}
+
+
+def summary() -> str:
+    """
+    Formats the statistics of every stage, by decreasing self time. The share
+    of a stage is its self time over the total self time, so nested stages are
+    counted once.
+
+    Returns:
+        str: The summary table.
+    """
+    stats = get_stats()
+    total = sum(stage["self_seconds"] for stage in stats.values()) or 1.0
+    lines = [f"{'stage':<32}{'calls':>10}{'seconds':>12}{'self':>12}{'share':>8}{'MB':>10}{'MB/s':>10}"]
+    for stage, values in sorted(stats.items(), key=lambda item: -item[1]["self_seconds"]):
+        megabytes = values["bytes"] / 1024 ** 2
+        rate = megabytes / values["seconds"] if values["seconds"] else 0.0
+        lines.append(
+            f"{stage:<32}{values['calls']:>10}{values['seconds']:>12.4f}{values['self_seconds']:>12.4f}"
+            f"{values['self_seconds'] / total:>8.1%}{megabytes:>10.1f}{rate:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+@contextmanager
+def profile(print_summary: bool=True, cprofile_path: str | None=None, trace_path: str | None=None) -> Iterator[dict]:
+    """
+    Context manager collecting stage statistics over a block of code, e.g. a full
+    corpus run from a notebook, without editing the code being profiled.
+
+    Args:
+        print_summary (bool): True to print the summary table on exit.
+        cprofile_path (str | None): A file receiving cProfile statistics, readable with pstats.
+        trace_path (str | None): A file receiving the calls as Chrome trace events,
+            readable with chrome://tracing or Perfetto.
+    Yields:
+        dict: A dictionary filled with the stage statistics on exit.
+    """
+    reset()
+    collected = {}
+    profiler = cProfile.Profile() if cprofile_path else None
+    enable(trace=trace_path is not None)
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield collected
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile_path)
+        disable()
+        collected.update(get_stats())
+        if trace_path is not None:
+            with _lock:
+                events = list(_events)
+            with open(trace_path, "w") as file:
+                json.dump({"traceEvents": events}, file)
+        if print_summary:
+            print(summary())
+
+
+def _stack() -> list:
+    """
+    Helper function. Gets the stage stack of the current thread.
+    """
+    stack = getattr(_stacks, "stack", None)
+    if stack is None:
+        stack = _stacks.stack = []
+    return stack
+
+
+def _record(stage: str, start: float, end: float, self_seconds: float, result, batch) -> None:
+    """
+    Helper function. Records a call of a stage.
+    """
+    n_bytes = _size(result)
+    bucket = None
+    try:
+        bucket = 1 << max(len(batch) - 1, 0).bit_length()
+    except TypeError:
+        # no argument, or a streaming source of unknown length
+        pass
+    with _lock:
+        stats = _stats.setdefault(stage, {"calls": 0, "seconds": 0.0, "self_seconds": 0.0, "bytes": 0, "batch_sizes": {}})
+        stats["calls"] += 1
+        stats["seconds"] += end - start
+        stats["self_seconds"] += self_seconds
+        stats["bytes"] += n_bytes
+        if bucket is not None:
+            stats["batch_sizes"][bucket] = stats["batch_sizes"].get(bucket, 0) + 1
+        if _tracing:
+            _events.append({
+                "name": stage,
+                "ph": "X",
+                "ts": start * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident()
+            })
+
+
+def _size(result) -> int:
+    """
+    Helper function. Counts the bytes produced by a call, or read by the block
+    readers returning (blocks, lengths, ...).
+    """
+    if isinstance(result, (bytes, bytearray)):
+        return len(result)
+    if hasattr(result, "nbytes"):
+        return int(result.nbytes)
+    if isinstance(result, tuple) and len(result) > 1 and getattr(result[1], "dtype", None) is not None and result[1].dtype.kind in "iu":
+        # the block matrix is zero-filled past the end of short files, the lengths are what was read
+        return int(result[1].sum())
+    if isinstance(result, tuple) and result and hasattr(result[0], "nbytes"):
+        return int(result[0].nbytes)
+    if isinstance(result, dict):
+        return sum(int(value.nbytes) for value in result.values() if hasattr(value, "nbytes"))
+    return 0
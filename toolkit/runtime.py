@@ -0,0 +1,180 @@
+import json
+
+import numpy as np
+
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+SUPPORTED_LAYERS = ("Dense", "Conv1D", "MaxPooling1D", "Flatten", "Dropout")
+
+
+def export_model(model, path: str) -> None:
+    """
+    Exports the weights of a Keras stack of Dense, Conv1D, MaxPooling1D, Flatten
+    and Dropout layers to a ".npz" file readable by NumpyModel.
+
+    Args:
+        model (keras.Model): A built Keras Sequential model.
+        path (str): The output file path.
+    """
+    layers = []
+    weights = {}
+    for i, layer in enumerate(model.layers):
+        kind = type(layer).__name__
+        if kind not in SUPPORTED_LAYERS:
+            raise ValueError(f"The {kind} layer is not supported by the NumPy runtime.")
+
+        config = layer.get_config()
+        spec = {"kind": kind}
+        if kind in ("Dense", "Conv1D"):
+            spec["activation"] = config["activation"]
+        if kind == "Conv1D":
+            if _first(config["dilation_rate"]) != 1 or config["padding"] not in ("valid", "same"):
+                raise ValueError("Only undilated Conv1D layers with valid or same padding are supported.")
+            spec["strides"] = _first(config["strides"])
+            spec["padding"] = config["padding"]
+        if kind == "MaxPooling1D":
+            if config["padding"] != "valid":
+                raise ValueError("Only MaxPooling1D layers with valid padding are supported.")
+            spec["pool_size"] = _first(config["pool_size"])
+            spec["strides"] = _first(config["strides"] or config["pool_size"])
+        for j, weight in enumerate(layer.get_weights()):
+            weights[f"layer{i}_weight{j}"] = weight.astype(np.float32)
+        spec["weights"] = len(layer.get_weights())
+        layers.append(spec)
+
+    config = {"input_shape": list(model.input_shape[1:]), "layers": layers}
+    np.savez(path, config=np.array(json.dumps(config)), **weights)
+
+
+class NumpyModel:
+    def __init__(self, config: dict, weights: dict):
+        """
+        A pure NumPy inference runtime for models exported with export_model or
+        BaseModel.export, with the same predict and predict_proba API as BaseModel.
+        Batches are computed with matrix products so the heavy lifting runs in BLAS.
+
+        Args:
+            config (dict): The exported model configuration.
+            weights (dict): The exported weights.
+        """
+        self.input_shape = (None, *config["input_shape"])
+        self.layers = []
+        for i, spec in enumerate(config["layers"]):
+            params = [weights[f"layer{i}_weight{j}"] for j in range(spec["weights"])]
+            self.layers.append((spec, params))
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyModel":
+        """
+        Loads an exported model.
+
+        Args:
+            path (str): The ".npz" file path.
+        Returns:
+            NumpyModel: The inference model.
+        """
+        with np.load(path) as data:
+            config = json.loads(str(data["config"]))
+            weights = {name: data[name] for name in data.files if name != "config"}
+        return cls(config, weights)
+
+    def predict(self, x: np.ndarray, batch_size: int | None=256) -> np.ndarray:
+        """
+        This method is for making predictions on unseen data.
+        """
+        self.predictions = self.predict_proba(x, batch_size=batch_size)
+        return np.argmax(self.predictions, axis=-1)
+
+    def predict_proba(self, x: np.ndarray, batch_size: int | None=256, verbose: str | int=0) -> np.ndarray:
+        """
+        This method returns the class probabilities predicted on unseen data.
+        """
+        x = np.asarray(x)
+        if x.ndim == len(self.input_shape) - 1:
+            x = x[..., np.newaxis]
+        batch_size = batch_size or len(x)
+        outputs = [self._forward(x[start:start + batch_size]) for start in range(0, len(x), batch_size)]
+        if not outputs:
+            return np.zeros((0, self.layers[-1][1][0].shape[-1]), dtype=np.float32)
+        return np.concatenate(outputs)
+
+    def _forward(self, x: np.ndarray) -> np.ndarray:
+        """
+        Helper method. Runs a batch through the layers.
+        """
+        x = x.astype(np.float32)
+        for spec, params in self.layers:
+            kind = spec["kind"]
+            if kind == "Dense":
+                x = x @ params[0]
+                if len(params) > 1:
+                    x += params[1]
+                x = _activation(x, spec["activation"])
+            elif kind == "Conv1D":
+                x = _conv1d(x, params[0], spec["strides"], spec["padding"])
+                if len(params) > 1:
+                    x += params[1]
+                x = _activation(x, spec["activation"])
+            elif kind == "MaxPooling1D":
+                x = _max_pooling1d(x, spec["pool_size"], spec["strides"])
+            elif kind == "Flatten":
+                x = x.reshape(len(x), -1)
+        return x
+
+
+def _first(value) -> int:
+    """
+    Helper function. Reads a 1D layer argument stored as an int or a 1-tuple.
+    """
+    return int(np.ravel(value)[0])
+
+
+def _conv1d(x: np.ndarray, kernel: np.ndarray, strides: int, padding: str) -> np.ndarray:
+    """
+    Helper function. A channels-last 1D convolution as a single matrix product.
+
+    Args:
+        x (np.ndarray): A (n, steps, channels) input.
+        kernel (np.ndarray): A (kernel_size, channels, filters) kernel.
+        strides (int): The convolution strides.
+        padding (str): "valid" or "same".
+    Returns:
+        np.ndarray: A (n, steps_out, filters) output.
+    """
+    kernel_size, channels, filters = kernel.shape
+    if padding == "same":
+        steps_out = -(-x.shape[1] // strides)
+        pad_total = max((steps_out - 1) * strides + kernel_size - x.shape[1], 0)
+        x = np.pad(x, ((0, 0), (pad_total // 2, pad_total - pad_total // 2), (0, 0)))
+    windows = sliding_window_view(x, kernel_size, axis=1)[:, ::strides]
+    windows = windows.reshape(*windows.shape[:2], channels * kernel_size)
+    return windows @ kernel.transpose(1, 0, 2).reshape(channels * kernel_size, filters)
+
+
+def _max_pooling1d(x: np.ndarray, pool_size: int, strides: int) -> np.ndarray:
+    """
+    Helper function. A channels-last 1D max pooling with valid padding.
+    """
+    if pool_size == strides:
+        steps = x.shape[1] // pool_size
+        return x[:, :steps * pool_size].reshape(len(x), steps, pool_size, -1).max(axis=2)
+    return sliding_window_view(x, pool_size, axis=1)[:, ::strides].max(axis=-1)
+
+
+def _activation(x: np.ndarray, name: str) -> np.ndarray:
+    """
+    Helper function. Applies a Keras activation by name.
+    """
+    if name == "relu":
+        return np.maximum(x, 0, out=x)
+    elif name == "softmax":
+        x = np.exp(x - x.max(axis=-1, keepdims=True))
+        return x / x.sum(axis=-1, keepdims=True)
+    elif name == "sigmoid":
+        return 1 / (1 + np.exp(-x))
+    elif name == "tanh":
+        return np.tanh(x)
+    elif name == "linear":
+        return x
+    raise ValueError(f"The {name} activation is not supported by the NumPy runtime.")
@@ -2,8 +2,13 @@
 import os
 import shutil
 import zipfile
+import threading
 import requests
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 
 class FileFormatError(Exception):
     def __init__(self, message: str="The file name does not end with \".zip\"."):
@@ -18,20 +23,30 @@ class FileFormatError(Exception):
 
 
 class Govdocs1Api:
-    def __init__(self, start_sample: int=-1, end_sample: int=-1, all_samples: bool=False):
+    def __init__(self, start_sample: int=-1, end_sample: int=-1, all_samples: bool=False, max_workers: int=4, url: str | None=None, chunk_size: int=1024 ** 2):
         """
         Provides a convinient way to download GovDocs1 dataset. You can either provide 
         a range to denote the zip files you're interesting in, or download all the 
-        1000 samples at once.
+        1000 samples at once. Zip files are downloaded concurrently over pooled
+        connections and streamed to disk, partial downloads are resumed, and the
+        samples already extracted are skipped when the download is run again.
 
         Args:
             start_sample (int): The first sample.
             end_sample (int): The last excluded sample (1000 max)
             all_samples (bool): True to download all dataset samples.
+            max_workers (int): The number of zip files downloaded at once.
+            url (str | None): The base url of the zip files, e.g. a local mirror.
+            chunk_size (int): The number of bytes written to disk at a time.
         """
         self.working_dir = os.getcwd()
         self.data_dir = "govdocs1"
-        self.url = "https://digitalcorpora.s3.amazonaws.com/corpora/files/govdocs1/zipfiles/"
+        self.done_dir = os.path.join(self.working_dir, f".{self.data_dir}_done")
+        self.url = url or "https://digitalcorpora.s3.amazonaws.com/corpora/files/govdocs1/zipfiles/"
+        if not self.url.endswith("/"):
+            self.url += "/"
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
         self.all_samples = all_samples
         if self.all_samples == True:
             self.num_samples = 1000
@@ -40,99 +55,122 @@ class Govdocs1Api:
             self.end_sample = end_sample
             self.num_samples = end_sample - start_sample
 
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=Retry(total=3, backoff_factor=1))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._completed = 0
+
     def download_dataset(self) -> None:
         """
         Downloads the govdocs1 dataset while updating the user on the progress.
         """
         print("Starting the download. The process might take some time.")
         os.makedirs(self.data_dir, exist_ok=True)
+        os.makedirs(self.done_dir, exist_ok=True)
         if self.all_samples:
-            for sample_no in range(self.num_samples):
-                self._download_govdocs1(sample_no)
+            samples = range(self.num_samples)
         else:
-            for sample_no in range(self.start_sample, self.end_sample):
-                self._download_govdocs1(sample_no)
+            samples = range(self.start_sample, self.end_sample)
+
+        self._completed = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for future in as_completed([executor.submit(self._download_govdocs1, sample_no) for sample_no in samples]):
+                future.result()
         print("Dataset download completed successfully.")
 
     def _download_govdocs1(self, sample_no: int) -> None:
         """
-        Helper method. It downloads a given zip file from govdocs1's server.
+        Helper method. It downloads a given zip file from govdocs1's server,
+        resuming a partial download when there is one.
 
         Args:
             sample_no (int): The zip file index number. 
         """
-        if len(str(sample_no)) == 1:
-            file_name = f"00{sample_no}.zip"
-        elif len(str(sample_no)) == 2:
-            file_name = f"0{sample_no}.zip"
-        elif len(str(sample_no)) == 3:
-            file_name = f"{sample_no}.zip"
-
-        url = self.url + file_name
-        response = requests.get(url)
-
-        if response.status_code == 200:
-            with open(f"{self.data_dir}/{file_name}", "wb") as file:
-                file.write(response.content)
-            self._exctract_files(file_name)
-            self._track_progress(file_name, sample_no)
-        else:
-            print(f"Failed to download {file_name}. Status code: {response.status_code}")
-
-    def _exctract_files(self, file_name: str) -> None:
+        file_name = f"{sample_no:03d}.zip"
+        if os.path.exists(os.path.join(self.done_dir, file_name)):
+            self._track_progress(file_name)
+            return
+
+        zip_file_path = os.path.join(self.data_dir, file_name)
+        if not os.path.exists(zip_file_path):
+            part_path = zip_file_path + ".part"
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+            try:
+                with self.session.get(self.url + file_name, headers=headers, stream=True, timeout=60) as response:
+                    if response.status_code == 416:
+                        pass
+                    elif response.status_code in (200, 206):
+                        mode = "ab" if response.status_code == 206 else "wb"
+                        with open(part_path, mode) as file:
+                            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                                file.write(chunk)
+                    else:
+                        print(f"Failed to download {file_name}. Status code: {response.status_code}")
+                        return
+            except requests.RequestException as e:
+                print(f"Failed to download {file_name}. {e}")
+                return
+            os.replace(part_path, zip_file_path)
+
+        if self._exctract_files(file_name):
+            self._track_progress(file_name)
+
+    def _exctract_files(self, file_name: str) -> bool:
         """
-        Helper method. Creates a temporary folder to extract files from a zip file 
-            then move extracted files to the main dataset directory and deletes
-            both the temporary folder and zip file.
+        Helper method. Extracts the files of a zip file straight into the main
+        dataset directory, skipping the ones already extracted, then deletes the
+        zip file and marks the sample as done.
 
         Args:
             file_name (str): The zip file name.
+        Returns:
+            bool: True when the extraction succeeded.
         """
         zip_file_path = os.path.join(self.working_dir, f"{self.data_dir}/{file_name}")
         extraction_dir = os.path.join(self.working_dir, self.data_dir)
-        temp_dir = os.path.join(self.working_dir, 'temp')
-
-        os.makedirs(temp_dir, exist_ok=True)
 
         try:
-            with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
-
-            if file_name.endswith('.zip'):
-                folder_extracted = file_name[:-4] + '/'
-            else:
+            if not file_name.endswith('.zip'):
                 raise FileFormatError("The file name does not end with \".zip\".")
-            
-            # move files from the extracted folder to the target directory
-            for root, dirs, files in os.walk(os.path.join(temp_dir, folder_extracted)):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    target_path = os.path.join(extraction_dir, file)
-                    shutil.move(file_path, target_path)
-            
-            shutil.rmtree(temp_dir)
+
+            with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+                for member in zip_ref.infolist():
+                    if member.is_dir():
+                        continue
+                    target_path = os.path.join(extraction_dir, os.path.basename(member.filename))
+                    if os.path.exists(target_path) and os.path.getsize(target_path) == member.file_size:
+                        continue
+                    with zip_ref.open(member) as source, open(target_path + ".part", "wb") as target:
+                        shutil.copyfileobj(source, target, self.chunk_size)
+                    os.replace(target_path + ".part", target_path)
+
+            open(os.path.join(self.done_dir, file_name), "w").close()
             os.remove(zip_file_path)
+            return True
 
         except zipfile.BadZipFile:
             print("The ZIP file is corrupted or not a valid ZIP file.")
+            os.remove(zip_file_path)
         except FileNotFoundError:
             print("The specified ZIP file was not found.")
         except PermissionError:
             print("Permission denied: unable to write to the extraction directory.")
         except Exception as e:
             print(f"An error occurred: {e}")
+        return False
 
-    def _track_progress(self, file_name: str, sample_no: int) -> None:
+    def _track_progress(self, file_name: str) -> None:
         """
         Helper method. Tracks the progress of the dataset download.
 
         Args:
             file_name (str): The downloaded zip file name.
-            sample_no (int): The zip file sample number.
         """
-        if self.all_samples:
-            percent_progress = (sample_no / self.num_samples) * 100
-            print(f"{file_name} downloaded. {sample_no}/{self.num_samples} ({percent_progress:.2f}%)")
-        else:
-            percent_progress = (sample_no - self.start_sample + 1) / self.num_samples * 100
-            print(f"{file_name} downloaded. {sample_no - self.start_sample + 1}/{self.num_samples} ({percent_progress:.2f}%)")
\ No newline at end of file
+        with self._lock:
+            self._completed += 1
+            percent_progress = self._completed / self.num_samples * 100
+            print(f"{file_name} downloaded. {self._completed}/{self.num_samples} ({percent_progress:.2f}%)")
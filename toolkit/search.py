@@ -0,0 +1,424 @@
+import os
+import json
+import math
+import time
+import shutil
+import hashlib
+import tempfile
+import multiprocessing
+
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+
+# the search spaces of models_random_search.ipynb, in the keras-tuner format of hps_results
+SEARCH_SPACES = {
+    "cnn": [
+        {"class_name": "Int", "config": {"name": "filters1", "default": None, "conditions": [], "min_value": 32, "max_value": 128, "step": 32, "sampling": "linear"}},
+        {"class_name": "Int", "config": {"name": "filters2", "default": None, "conditions": [], "min_value": 64, "max_value": 256, "step": 64, "sampling": "linear"}},
+        {"class_name": "Float", "config": {"name": "dropout", "default": 0.2, "conditions": [], "min_value": 0.2, "max_value": 0.5, "step": 0.1, "sampling": "linear"}},
+        {"class_name": "Int", "config": {"name": "units", "default": None, "conditions": [], "min_value": 64, "max_value": 256, "step": 64, "sampling": "linear"}},
+        {"class_name": "Choice", "config": {"name": "learning_rate", "default": 0.01, "conditions": [], "values": [0.01, 0.001, 0.0001], "ordered": True}}
+    ],
+    "ffnn": [
+        {"class_name": "Int", "config": {"name": "units1", "default": None, "conditions": [], "min_value": 32, "max_value": 512, "step": 32, "sampling": "linear"}},
+        {"class_name": "Int", "config": {"name": "units2", "default": None, "conditions": [], "min_value": 32, "max_value": 512, "step": 32, "sampling": "linear"}},
+        {"class_name": "Boolean", "config": {"name": "add_layer", "default": False, "conditions": []}},
+        {"class_name": "Choice", "config": {"name": "learning_rate", "default": 0.01, "conditions": [], "values": [0.01, 0.001, 0.0001], "ordered": True}},
+        {"class_name": "Int", "config": {"name": "units3", "default": None, "conditions": [], "min_value": 32, "max_value": 512, "step": 32, "sampling": "linear"}}
+    ]
+}
+
+MODEL_CLASSES = {"cnn": "Cnn2", "ffnn": "Ffnn2"}
+
+# read by the BLAS, OpenMP and TensorFlow thread pools when they start
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS")
+
+_data = {}
+
+
+class ParallelSearch:
+    def __init__(
+        self,
+        model: str="cnn",
+        directory: str="hps_results",
+        project_name: str | None=None,
+        max_trials: int=10,
+        objective: str="val_accuracy",
+        min_epochs: int=1,
+        max_epochs: int=5,
+        reduction_factor: int=3,
+        n_workers: int | None=None,
+        threads_per_worker: int=2,
+        batch_size: int=32,
+        seed: int | None=None,
+        overwrite: bool=False
+    ):
+        """
+        Random search over the Cnn2 or Ffnn2 hyperparameters, running trials in
+        parallel worker processes and stopping bad trials early with successive
+        halving: every trial is trained for min_epochs, the best 1 / reduction_factor
+        of them resume training for reduction_factor times more epochs, and so on
+        until max_epochs. Results are written in the keras-tuner layout of
+        hps_results, i.e. an oracle.json file and a trial_NN folder per trial.
+
+        Each worker is pinned to its own threads_per_worker cores, and its BLAS
+        and TensorFlow thread pools are capped to them, so workers do not compete
+        for cores. The training data is written once to .npy files that every
+        worker memory-maps, so it is shared through the page cache. They live in a
+        temporary directory removed when the search ends, not next to the results.
+
+        Args:
+            model (str): The searched model, "cnn" (Cnn2) or "ffnn" (Ffnn2).
+            directory (str): The results directory.
+            project_name (str | None): The results subfolder, the model name and
+                the start time if None, so existing results are never replaced
+                by default.
+            max_trials (int): The number of sampled hyperparameter sets.
+            objective (str): The history metric ranking the trials.
+            min_epochs (int): The epochs every trial is trained for.
+            max_epochs (int): The epochs the best trials are trained for.
+            reduction_factor (int): The ratio of trials stopped at each rung.
+            n_workers (int | None): The number of worker processes, as many as
+                the available cores allow if None.
+            threads_per_worker (int): The cores and threads of each worker.
+            batch_size (int): The training batch size.
+            seed (int | None): The sampling and shuffling seed.
+            overwrite (bool): True to replace existing results of the project.
+        """
+        if model not in SEARCH_SPACES:
+            raise ValueError(f"Unknown model: {model}, expected one of {', '.join(SEARCH_SPACES)}.")
+        if min_epochs < 1 or max_epochs < min_epochs or reduction_factor < 2:
+            raise ValueError("Expected 1 <= min_epochs <= max_epochs and reduction_factor >= 2.")
+
+        self.model = model
+        self.project_dir = os.path.join(directory, project_name or f"{model}_{datetime.now():%Y%m%d_%H%M%S}")
+        self.max_trials = max_trials
+        self.objective = objective
+        self.direction = "min" if "loss" in objective else "max"
+        self.min_epochs = min_epochs
+        self.max_epochs = max_epochs
+        self.reduction_factor = reduction_factor
+        self.threads_per_worker = threads_per_worker
+        self.batch_size = batch_size
+        self.seed = seed if seed is not None else int(np.random.SeedSequence().entropy % 10000)
+        self.overwrite = overwrite
+
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+        self.n_workers = n_workers or max(len(cores) // threads_per_worker, 1)
+        self.core_sets = [
+            cores[i * threads_per_worker:(i + 1) * threads_per_worker] for i in range(self.n_workers)
+        ] if self.n_workers * threads_per_worker <= len(cores) else None
+        self.trials = {}
+
+    def search(self, x: np.ndarray | str, y: np.ndarray | str, validation_data: tuple) -> list:
+        """
+        Runs the search.
+
+        Args:
+            x (np.ndarray | str): The (n, timesteps) or (n, timesteps, features)
+                training inputs, or the path of a .npy file holding them.
+            y (np.ndarray | str): The training classes, or a .npy path.
+            validation_data (tuple): The (x, y) validation arrays or .npy paths.
+        Returns:
+            list: The trials sorted from best to worst.
+        """
+        if os.path.exists(self.project_dir):
+            if not self.overwrite:
+                raise FileExistsError(f"{self.project_dir} already exists, set overwrite=True to replace it.")
+            shutil.rmtree(self.project_dir)
+        os.makedirs(self.project_dir)
+
+        data_dir = tempfile.mkdtemp(prefix="search-data-")
+        try:
+            return self._search(self._share_data(data_dir, {"x": x, "y": y, "x_val": validation_data[0], "y_val": validation_data[1]}))
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    def _search(self, data_paths: dict) -> list:
+        """
+        Helper method. Runs the rungs of the search over the shared data.
+        """
+        input_shape = np.load(data_paths["x"], mmap_mode="r").shape
+        self.build_config = {"input_shape": [None, input_shape[1], input_shape[2] if len(input_shape) > 2 else 1]}
+
+        rng = np.random.default_rng(self.seed)
+        self.search_start = datetime.now().isoformat()
+        self._sample_trials(rng)
+
+        # spawned workers do not inherit the TensorFlow state of the notebook process
+        context = multiprocessing.get_context("spawn")
+        cores = context.Queue()
+        for core_set in self.core_sets or []:
+            cores.put(core_set)
+
+        with ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(cores if self.core_sets else None, self.threads_per_worker, data_paths)
+        ) as executor:
+            running = list(self.trials)
+            epochs = 0
+            for rung_epochs in self.rungs():
+                futures = {
+                    executor.submit(
+                        _run_trial, self.model, self.trials[trial_id]["hyperparameters"]["values"], self._trial_dir(trial_id),
+                        epochs, rung_epochs, self.batch_size, self.seed + 1000 * int(trial_id)
+                    ): trial_id
+                    for trial_id in running
+                }
+                for future in as_completed(futures):
+                    trial_id = futures[future]
+                    self._record(trial_id, *future.result())
+                    self._write_trial(trial_id)
+
+                running = self._promote(running, rung_epochs)
+                epochs = rung_epochs
+                self._write_oracle()
+
+        for trial_id in running:
+            self.trials[trial_id]["status"] = "COMPLETED"
+            self._write_trial(trial_id)
+        self._write_oracle()
+        return self.get_best_trials(len(self.trials))
+
+    def rungs(self) -> list:
+        """
+        Gets the cumulative number of epochs trained at each rung.
+
+        Returns:
+            list: The rung epochs, ending with max_epochs.
+        """
+        rungs = [self.min_epochs]
+        while rungs[-1] < self.max_epochs:
+            rungs.append(min(rungs[-1] * self.reduction_factor, self.max_epochs))
+        return rungs
+
+    def get_best_trials(self, num_trials: int=1) -> list:
+        """
+        Gets the best trials, the ones trained the longest first.
+
+        Args:
+            num_trials (int): The number of trials.
+        Returns:
+            list: The trial dictionaries, as written to trial.json.
+        """
+        sign = -1 if self.direction == "max" else 1
+
+        def rank(trial: dict) -> tuple:
+            epochs = trial["metrics"]["metrics"][self.objective]["observations"][-1]["step"]
+            return -epochs, sign * trial["score"]
+
+        return sorted((trial for trial in self.trials.values() if trial["score"] is not None), key=rank)[:num_trials]
+
+    def get_best_hyperparameters(self, num_trials: int=1) -> list:
+        """
+        Gets the hyperparameters of the best trials, to be passed to Cnn2 or Ffnn2.
+
+        Args:
+            num_trials (int): The number of trials.
+        Returns:
+            list: The hyperparameter dictionaries.
+        """
+        return [dict(trial["hyperparameters"]["values"]) for trial in self.get_best_trials(num_trials)]
+
+    def _share_data(self, data_dir: str, arrays: dict) -> dict:
+        """
+        Helper method. Writes the arrays that are not .npy paths yet to .npy files
+        the workers memory-map.
+        """
+        paths = {}
+        for name, array in arrays.items():
+            if isinstance(array, str):
+                paths[name] = array
+                continue
+            paths[name] = os.path.join(data_dir, f"{name}.npy")
+            np.save(paths[name], np.asarray(array))
+        return paths
+
+    def _sample_trials(self, rng: np.random.Generator) -> None:
+        """
+        Helper method. Samples max_trials distinct hyperparameter sets.
+        """
+        space = SEARCH_SPACES[self.model]
+        seen = set()
+        attempts = 0
+        while len(self.trials) < self.max_trials and attempts < 100 * self.max_trials:
+            attempts += 1
+            values = {hp["config"]["name"]: _sample(hp, rng) for hp in space}
+            values_hash = _values_hash(values)
+            if values_hash in seen:
+                continue
+            seen.add(values_hash)
+            trial_id = f"{len(self.trials):02d}"
+            self.trials[trial_id] = {
+                "trial_id": trial_id,
+                "hyperparameters": {"space": space, "values": values},
+                "metrics": {"metrics": {}},
+                "score": None,
+                "best_step": None,
+                "status": "RUNNING",
+                "message": None,
+                "hash": values_hash,
+                "start": None
+            }
+
+    def _trial_dir(self, trial_id: str) -> str:
+        return os.path.join(self.project_dir, f"trial_{trial_id}")
+
+    def _record(self, trial_id: str, history: dict, initial_epoch: int, start: str) -> None:
+        """
+        Helper method. Appends the epochs of a rung to the trial metrics.
+        """
+        trial = self.trials[trial_id]
+        trial["start"] = trial["start"] or start
+        for name, values in history.items():
+            direction = "min" if "loss" in name else "max"
+            metric = trial["metrics"]["metrics"].setdefault(name, {"direction": direction, "observations": []})
+            metric["observations"].extend(
+                {"value": [float(value)], "step": initial_epoch + step} for step, value in enumerate(values)
+            )
+        observations = trial["metrics"]["metrics"][self.objective]["observations"]
+        best = (max if self.direction == "max" else min)(observations, key=lambda observation: observation["value"][0])
+        trial["score"], trial["best_step"] = best["value"][0], best["step"]
+
+    def _promote(self, running: list, rung_epochs: int) -> list:
+        """
+        Helper method. Keeps the best 1 / reduction_factor of the running trials
+        and stops the others.
+        """
+        if rung_epochs >= self.max_epochs:
+            return running
+        sign = -1 if self.direction == "max" else 1
+        ranked = sorted(running, key=lambda trial_id: sign * self.trials[trial_id]["score"])
+        keep = max(math.ceil(len(ranked) / self.reduction_factor), 1)
+        for trial_id in ranked[keep:]:
+            self.trials[trial_id]["status"] = "STOPPED"
+            self.trials[trial_id]["message"] = f"Stopped by successive halving after {rung_epochs} epochs."
+            self._write_trial(trial_id)
+        return ranked[:keep]
+
+    def _write_trial(self, trial_id: str) -> None:
+        """
+        Helper method. Writes trial.json and build_config.json of a trial.
+        """
+        trial_dir = self._trial_dir(trial_id)
+        os.makedirs(trial_dir, exist_ok=True)
+        trial = {key: value for key, value in self.trials[trial_id].items() if key not in ("hash", "start")}
+        with open(os.path.join(trial_dir, "trial.json"), "w") as file:
+            json.dump(trial, file)
+        with open(os.path.join(trial_dir, "build_config.json"), "w") as file:
+            json.dump(self.build_config, file)
+
+    def _write_oracle(self) -> None:
+        """
+        Helper method. Writes oracle.json with the state of every trial.
+        """
+        trial_ids = list(self.trials)
+        ended = [trial_id for trial_id in trial_ids if self.trials[trial_id]["status"] in ("COMPLETED", "STOPPED")]
+        oracle = {
+            "ongoing_trials": {},
+            "hyperparameters": {
+                "space": SEARCH_SPACES[self.model],
+                "values": {hp["config"]["name"]: hp["config"]["default"] for hp in SEARCH_SPACES[self.model]}
+            },
+            "start_order": trial_ids,
+            "end_order": ended,
+            "run_times": {trial_id: 1 for trial_id in trial_ids},
+            "retry_queue": [],
+            "seed": self.seed,
+            "seed_state": self.seed + len(trial_ids),
+            "tried_so_far": [self.trials[trial_id]["hash"] for trial_id in trial_ids],
+            "id_to_hash": {trial_id: self.trials[trial_id]["hash"] for trial_id in trial_ids},
+            "display": {
+                "search_start": self.search_start,
+                "trial_start": {trial_id: self.trials[trial_id]["start"] for trial_id in trial_ids},
+                "trial_number": {trial_id: i + 1 for i, trial_id in enumerate(trial_ids)}
+            }
+        }
+        with open(os.path.join(self.project_dir, "oracle.json"), "w") as file:
+            json.dump(oracle, file)
+
+
+def _sample(hp: dict, rng: np.random.Generator):
+    """
+    Helper function. Samples a value of a keras-tuner hyperparameter.
+    """
+    config = hp["config"]
+    if hp["class_name"] == "Boolean":
+        return bool(rng.integers(2))
+    if hp["class_name"] == "Choice":
+        return config["values"][rng.integers(len(config["values"]))]
+    n_steps = int(round((config["max_value"] - config["min_value"]) / config["step"])) + 1
+    value = config["min_value"] + config["step"] * int(rng.integers(n_steps))
+    if hp["class_name"] == "Int":
+        return int(value)
+    return round(float(value), 10)
+
+
+def _values_hash(values: dict) -> str:
+    """
+    Helper function. Hashes hyperparameter values like keras-tuner does for tried_so_far.
+    """
+    text = "".join(f"{name}={values[name]}" for name in sorted(values))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def _init_worker(cores, threads: int, data_paths: dict) -> None:
+    """
+    Helper function. Pins a worker process to its cores, caps its thread pools
+    and memory-maps the training data, before TensorFlow is imported.
+    """
+    if cores is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores.get())
+    for variable in THREAD_VARIABLES:
+        os.environ[variable] = str(threads)
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    _data.update({name: np.load(path, mmap_mode="r") for name, path in data_paths.items()})
+
+
+def _run_trial(model: str, values: dict, trial_dir: str, initial_epoch: int, epochs: int, batch_size: int, seed: int) -> tuple:
+    """
+    Helper function. Trains a trial from its last checkpoint up to epochs in a
+    worker process, and saves a new checkpoint. Checkpoints hold the whole model,
+    so a promoted trial resumes with its optimizer state, and every rung
+    shuffles with its own seed.
+    """
+    import keras
+
+    from . import models
+    from .pipeline import block_dataset
+
+    start = datetime.now().isoformat()
+    # a rung seed per trial and starting epoch, a resumed trial would otherwise replay the shuffles of its first rung
+    seed += initial_epoch
+    keras.utils.set_random_seed(seed)
+    x, y, x_val, y_val = _data["x"], _data["y"], _data["x_val"], _data["y_val"]
+
+    os.makedirs(trial_dir, exist_ok=True)
+    checkpoint = os.path.join(trial_dir, "checkpoint.keras")
+    if initial_epoch:
+        network = keras.models.load_model(checkpoint)
+    else:
+        features = x.shape[2] if x.ndim > 2 else 1
+        network = getattr(models, MODEL_CLASSES[model])(timesteps=x.shape[1], features=features, **values).model
+
+    started = time.perf_counter()
+    history = network.fit(
+        block_dataset(x, y, batch_size=batch_size, shuffle=True, seed=seed),
+        validation_data=block_dataset(x_val, y_val, batch_size=batch_size),
+        epochs=epochs,
+        initial_epoch=initial_epoch,
+        verbose=0
+    )
+    network.save(checkpoint)
+    print(f"Trial {os.path.basename(trial_dir)}: epochs {initial_epoch + 1}-{epochs} in {time.perf_counter() - started:.1f}s")
+    return history.history, initial_epoch, start
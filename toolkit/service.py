@@ -0,0 +1,293 @@
+import json
+import time
+import queue
+import base64
+import argparse
+import threading
+
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import Request, urlopen
+
+import numpy as np
+
+from .models_interface import BaseModel
+from .inference import model_timesteps
+from .utils import BLOCK_SIZE_BYTES, read_blocks, block_features, convert_num2cat
+
+
+class PredictionError(RuntimeError):
+    """
+    Raised when the model fails on a micro-batch, answered with a 500 status.
+    """
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn, max_batch_size: int=64, max_latency_ms: float=2.0):
+        """
+        Groups concurrent prediction requests into micro-batches. A batch is sent
+        to predict_fn as soon as it is full, or when max_latency_ms has passed
+        since its first request arrived.
+
+        Args:
+            predict_fn (callable): Maps a (n, ...) feature array to (n, n_classes) probabilities.
+            max_batch_size (int): The maximum number of requests per batch.
+            max_latency_ms (float): The maximum time a request waits for a batch to fill.
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, features: np.ndarray) -> Future:
+        """
+        Submits the features of one sample.
+
+        Args:
+            features (np.ndarray): The features of a single sample.
+        Returns:
+            Future: A future resolving to the sample class probabilities.
+        """
+        future = Future()
+        self._queue.put((features, future))
+        return future
+
+    def close(self) -> None:
+        """
+        Stops the batching thread once the queued requests are served.
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        """
+        Helper method. Collects requests into batches and runs the predictions.
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.max_latency
+            closing = False
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+
+            self._predict(batch)
+            if closing:
+                return
+
+    def _predict(self, batch: list) -> None:
+        """
+        Helper method. Predicts a batch and resolves its futures.
+        """
+        batch = [(features, future) for features, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            probabilities = self.predict_fn(np.stack([features for features, _ in batch]))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), probability in zip(batch, probabilities):
+            future.set_result(probability)
+        self.batches += 1
+        self.requests += len(batch)
+
+
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, model: BaseModel | str, host: str="127.0.0.1", port: int=8765, max_batch_size: int=64, max_latency_ms: float=2.0, block_size: int=BLOCK_SIZE_BYTES):
+        """
+        A localhost HTTP service keeping a model warm in memory. POST a JSON body
+        to /predict holding either "paths", a list of file paths whose first block
+        is read, or "blocks", a list of base64 encoded blocks. Concurrent requests
+        are grouped into micro-batches and each item is answered with its class,
+        type and confidence, in the label space of convert_cat2num.
+
+        Args:
+            model (BaseModel | str): A trained model or the path of a saved model.
+            host (str): The interface to listen on.
+            port (int): The port to listen on, 0 for any free port.
+            max_batch_size (int): The maximum number of items per prediction batch.
+            max_latency_ms (float): The maximum time an item waits for a batch to fill.
+            block_size (int): The number of bytes read from each file.
+        """
+        if isinstance(model, str):
+            model = BaseModel.load(model)
+        self.model = model
+        self.block_size = block_size
+        self.timesteps = model_timesteps(model)
+        self.batcher = MicroBatcher(self._predict_batch, max_batch_size=max_batch_size, max_latency_ms=max_latency_ms)
+        # warm up the prediction graph so that the first request is not slowed down
+        self._predict_batch(np.zeros((1, self.timesteps)))
+        super().__init__((host, port), _PredictionHandler)
+
+    def predict(self, blocks: list) -> list:
+        """
+        Classifies blocks through the micro-batcher.
+
+        Args:
+            blocks (list): The block bytes.
+        Returns:
+            list: A dictionary with the 'class', 'type' and 'confidence' of each block.
+        """
+        block_bytes = np.zeros((len(blocks), self.block_size), dtype=np.uint8)
+        lengths = np.zeros(len(blocks), dtype=np.int32)
+        for i, block in enumerate(blocks):
+            block = block[:self.block_size]
+            block_bytes[i, :len(block)] = np.frombuffer(block, dtype=np.uint8)
+            lengths[i] = len(block)
+        return self._predict_features(block_features(block_bytes, lengths, self.timesteps), lengths)
+
+    def predict_paths(self, paths: list) -> list:
+        """
+        Classifies files from their first block through the micro-batcher.
+
+        Args:
+            paths (list): The file paths.
+        Returns:
+            list: A dictionary with the 'class', 'type' and 'confidence' of each file,
+                with a None type and a 0.0 confidence for empty files.
+        """
+        block_bytes, lengths = read_blocks(paths, ("first",), self.block_size)
+        return self._predict_features(block_features(block_bytes[:, 0], lengths[:, 0], self.timesteps), lengths[:, 0])
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.batcher.close()
+
+    def _predict_batch(self, x: np.ndarray) -> np.ndarray:
+        """
+        Helper method. Predicts a micro-batch. Keras models go through
+        predict_on_batch, which reuses the compiled predict function without
+        building the data adapter, epoch iterator and callbacks of predict.
+        """
+        keras_model = getattr(self.model, "model", None)
+        if keras_model is None or not hasattr(keras_model, "predict_on_batch"):
+            return self.model.predict_proba(x, batch_size=len(x), verbose=0)
+        x = np.asarray(x, dtype=np.float32)
+        if x.ndim == 2 and len(keras_model.input_shape) == 3:
+            x = x[..., np.newaxis]
+        return np.asarray(keras_model.predict_on_batch(x))
+
+    def _predict_features(self, features: np.ndarray, lengths: np.ndarray) -> list:
+        """
+        Helper method. Submits the features of non-empty blocks to the micro-batcher
+        and formats the results.
+        """
+        futures = [self.batcher.submit(row) if length else None for row, length in zip(features, lengths)]
+        results = []
+        for future in futures:
+            if future is None:
+                results.append({"class": 0, "type": None, "confidence": 0.0})
+                continue
+            try:
+                probabilities = future.result()
+            except Exception as e:
+                raise PredictionError(f"The model failed: {e}") from e
+            class_num = int(np.argmax(probabilities))
+            results.append({
+                "class": class_num,
+                "type": convert_num2cat(class_num),
+                "confidence": float(probabilities[class_num])
+            })
+        return results
+
+
+class _PredictionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        if self.path != "/predict":
+            self._respond(404, {"error": "Not found."})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if "paths" in body:
+                results = self.server.predict_paths(body["paths"])
+            elif "blocks" in body:
+                results = self.server.predict([base64.b64decode(block) for block in body["blocks"]])
+            else:
+                raise ValueError("The request must contain \"paths\" or \"blocks\".")
+        except PredictionError as e:
+            self._respond(500, {"error": str(e)})
+            return
+        except (ValueError, KeyError, TypeError, OSError) as e:
+            self._respond(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self._respond(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+        self._respond(200, {"results": results})
+
+    def _respond(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def request_predictions(paths: list | None=None, blocks: list | None=None, url: str="http://127.0.0.1:8765/predict", timeout: float=10.0) -> list:
+    """
+    Client helper. Asks a running PredictionServer to classify files or blocks.
+
+    Args:
+        paths (list | None): The file paths.
+        blocks (list | None): The block bytes.
+        url (str): The prediction endpoint.
+        timeout (float): The request timeout in seconds.
+    Returns:
+        list: A dictionary with the 'class', 'type' and 'confidence' of each item.
+    """
+    if paths is not None:
+        body = {"paths": list(paths)}
+    else:
+        body = {"blocks": [base64.b64encode(block).decode() for block in blocks]}
+    request = Request(url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"})
+    with urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())["results"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve file type predictions from a saved model.")
+    parser.add_argument("model", help="The path of a saved model.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-latency-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    server = PredictionServer(args.model, args.host, args.port, args.max_batch_size, args.max_latency_ms)
+    print(f"Serving predictions on http://{args.host}:{server.server_address[1]}/predict")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import numpy as np
+
+from .utils import convert_cat2num
+from .models_interface import BaseModel
+
+# (file types, offset, magic number). Several types share a signature when the
+# header alone cannot tell them apart, e.g. the OLE2 compound documents.
+SIGNATURES = [
+    (("pdf",), 0, b"%PDF-"),
+    (("ps",), 0, b"%!PS"),
+    (("png",), 0, b"\x89PNG\r\n\x1a\n"),
+    (("gif",), 0, b"GIF87a"),
+    (("gif",), 0, b"GIF89a"),
+    (("jpg",), 0, b"\xff\xd8\xff"),
+    (("swf",), 0, b"FWS"),
+    (("swf",), 0, b"CWS"),
+    (("swf",), 0, b"ZWS"),
+    (("doc", "xls", "ppt"), 0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"),
+]
+
+
+def match_signatures(blocks: np.ndarray, lengths: np.ndarray, signatures: list=SIGNATURES) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Matches the magic numbers of many first blocks at once, one vectorized
+    comparison per signature.
+
+    Args:
+        blocks (np.ndarray): A (n, block_size) uint8 array of first blocks.
+        lengths (np.ndarray): The number of valid bytes of each block.
+        signatures (list): The (file types, offset, magic number) signatures.
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The class of each block when a signature
+            identifies a single type, 0 otherwise, and a (n, 13) mask of the
+            classes each block can still belong to, all True without a match.
+    """
+    n = len(blocks)
+    lengths = np.asarray(lengths)
+    classes = np.zeros(n, dtype=np.int64)
+    candidates = np.ones((n, BaseModel.NUM_CLASSES), dtype=bool)
+    matched = np.zeros(n, dtype=bool)
+    for file_types, offset, magic in signatures:
+        end = offset + len(magic)
+        if end > blocks.shape[1]:
+            continue
+        magic = np.frombuffer(magic, dtype=np.uint8)
+        hits = ~matched & (lengths >= end) & np.all(blocks[:, offset:end] == magic, axis=1)
+        if not hits.any():
+            continue
+
+        allowed = np.zeros(BaseModel.NUM_CLASSES, dtype=bool)
+        allowed[[convert_cat2num(file_type) for file_type in file_types]] = True
+        candidates[hits] = allowed
+        if len(file_types) == 1:
+            classes[hits] = convert_cat2num(file_types[0])
+        matched |= hits
+    return classes, candidates
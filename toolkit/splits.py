@@ -0,0 +1,125 @@
+from typing import Iterator
+
+import numpy as np
+
+
+def stratified_sample(labels: np.ndarray, n: int=2000, exempt: tuple=(), seed: int=42) -> np.ndarray:
+    """
+    Samples up to n rows of each class, the vectorized equivalent of
+    df.groupby('type').apply(lambda x: x if x.name == "png" else x.sample(n=min(len(x), n))).
+
+    Args:
+        labels (np.ndarray): The class, type code or type name of each row.
+        n (int): The maximum number of rows per class.
+        exempt (tuple): The classes whose rows are all kept, e.g. ("png",).
+        seed (int): The sampling seed.
+    Returns:
+        np.ndarray: The sorted indices of the sampled rows.
+    """
+    labels = np.asarray(labels)
+    rng = np.random.default_rng(seed)
+    grouped, ranks, _ = _group_ranks(labels, rng)
+    keep = (ranks < n) | np.isin(labels[grouped], list(exempt))
+    return np.sort(grouped[keep])
+
+
+def train_val_test_split(
+    labels: np.ndarray | int,
+    val_size: float=0.15,
+    test_size: float=0.15,
+    seed: int=42,
+    stratify: bool=True
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Splits rows into training, validation and testing indices, replacing the two
+    train_test_split calls of the notebooks (70/30 then 50/50) that copied X at
+    every stage. Only indices are produced: feed them to block_dataset(x, y,
+    indices=...) over a BlockCache memmap, or index x once, so the block data
+    is never duplicated.
+
+    Args:
+        labels (np.ndarray | int): The class of each row, or the number of rows.
+        val_size (float): The share of validation rows.
+        test_size (float): The share of testing rows.
+        seed (int): The shuffling seed.
+        stratify (bool): True to keep the class shares in every split.
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: The sorted training, validation
+            and testing indices, views of a single index array.
+    """
+    if val_size < 0 or test_size < 0 or val_size + test_size >= 1:
+        raise ValueError("Expected non-negative val_size and test_size summing to less than 1.")
+    labels = _as_labels(labels, stratify)
+    rng = np.random.default_rng(seed)
+    grouped, ranks, counts = _group_ranks(labels, rng)
+
+    # the position of each row within its class, between 0 and 1
+    positions = (ranks + 0.5) / counts
+    splits = np.searchsorted([1 - val_size - test_size, 1 - test_size], positions, side="right")
+    return _split_views(grouped, splits, 3)
+
+
+def kfold(labels: np.ndarray | int, k: int=5, seed: int=42, stratify: bool=True) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """
+    Splits rows into k folds, each used once for validation.
+
+    Args:
+        labels (np.ndarray | int): The class of each row, or the number of rows.
+        k (int): The number of folds.
+        seed (int): The shuffling seed.
+        stratify (bool): True to keep the class shares in every fold.
+    Yields:
+        tuple[np.ndarray, np.ndarray]: The sorted training and validation indices
+            of each fold. Validation indices are views of a single index array.
+    """
+    if k < 2:
+        raise ValueError("Expected k >= 2.")
+    labels = _as_labels(labels, stratify)
+    rng = np.random.default_rng(seed)
+    grouped, ranks, _ = _group_ranks(labels, rng)
+
+    # dealing the shuffled rows of each class round-robin balances the folds
+    folds = _split_views(grouped, ranks % k, k)
+    for i, validation in enumerate(folds):
+        training = np.sort(np.concatenate([fold for j, fold in enumerate(folds) if j != i]))
+        yield training, validation
+
+
+def _as_labels(labels: np.ndarray | int, stratify: bool) -> np.ndarray:
+    """
+    Helper function. Gets the labels to group by, a single group when not stratifying.
+    """
+    if np.isscalar(labels):
+        return np.zeros(int(labels), dtype=np.int8)
+    labels = np.asarray(labels)
+    return labels if stratify else np.zeros(len(labels), dtype=np.int8)
+
+
+def _group_ranks(labels: np.ndarray, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Helper function. Shuffles the rows, groups them by label and ranks them
+    within their group.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: The grouped row indices, their
+            rank in their group and the size of their group.
+    """
+    shuffled = rng.permutation(len(labels))
+    grouped = shuffled[np.argsort(labels[shuffled], kind="stable")]
+    sorted_labels = labels[grouped]
+    group_starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]]) if len(grouped) else np.zeros(0, dtype=np.int64)
+    group_sizes = np.diff(np.r_[group_starts, len(grouped)])
+    ranks = np.arange(len(grouped)) - np.repeat(group_starts, group_sizes)
+    return grouped, ranks, np.repeat(group_sizes, group_sizes)
+
+
+def _split_views(rows: np.ndarray, splits: np.ndarray, n_splits: int) -> list:
+    """
+    Helper function. Orders rows by split and returns each split as a sorted view.
+    """
+    ordered = rows[np.argsort(splits, kind="stable")]
+    bounds = np.r_[0, np.cumsum(np.bincount(splits, minlength=n_splits))]
+    views = [ordered[bounds[i]:bounds[i + 1]] for i in range(n_splits)]
+    for view in views:
+        view.sort()
+    return views
@@ -1,9 +1,26 @@
+from __future__ import annotations
+
 import os
 import math
+import numbers
+import zipfile
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
-import pandas as pd
 
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+from .profiling import instrument
+
+
+BLOCK_SIZE_BYTES = 4096
+PAD_VALUE = 260
+CLASS_NAMES = ["doc", "pdf", "ps", "xls", "ppt", "swf", "gif", "jpg", "png", "html", "txt", "xml"]
 
 def get_file_types(directory: str) -> list:
     """
@@ -23,6 +40,7 @@ def get_file_types(directory: str) -> list:
     return files_data
 
 
+@instrument("read.bytes")
 def get_bytes(path: str) -> bytes:
     """
     Gets all the bytes to construct a file.
@@ -37,6 +55,7 @@ def get_bytes(path: str) -> bytes:
     return binary_data
 
 
+@instrument("read.first_block")
 def get_1st_block_bytes(path: str) -> bytes:
     """
     Gets the 4096 bytes of the first block where a file data are stored.
@@ -52,6 +71,7 @@ def get_1st_block_bytes(path: str) -> bytes:
     return binary_data
 
 
+@instrument("read.body_block")
 def get_2nd_block_bytes(path: str) -> bytes:
     """
     Gets 4096 bytes of a file body block.
@@ -69,6 +89,7 @@ def get_2nd_block_bytes(path: str) -> bytes:
     return binary_data
 
 
+@instrument("read.last_block")
 def get_last_block_bytes(path: str, file_size_kb: float) -> bytes:
     """
     Gets the 4096 bytes of the last block where a file data are stored.
@@ -89,6 +110,238 @@ def get_last_block_bytes(path: str, file_size_kb: float) -> bytes:
     return binary_data
 
 
+def _block_offset(selector: str | int, file_size: int, block_size: int=BLOCK_SIZE_BYTES) -> int:
+    """
+    Helper function. Resolves a block selector to a byte offset in a file.
+
+    Args:
+        selector (str | int): "first", "body", "last", or an absolute byte offset.
+        file_size (int): The file size in bytes.
+        block_size (int): The block size in bytes.
+    Returns:
+        int: The offset of the selected block.
+    """
+    if selector == "first":
+        return 0
+    elif selector == "body":
+        return block_size
+    elif selector == "last":
+        number_of_blocks = math.ceil(file_size / block_size)
+        return max(number_of_blocks - 1, 0) * block_size
+    elif isinstance(selector, numbers.Integral) and not isinstance(selector, (bool, np.bool_)) and selector >= 0:
+        return int(selector)
+    raise ValueError(f"Invalid block selector: {selector!r}.")
+
+
+def _pread(fd: int, length: int, offset: int) -> bytes:
+    """
+    Helper function. Reads bytes at an offset without moving the file position
+    where os.pread is available, and falls back to seek and read otherwise.
+
+    Args:
+        fd (int): An open file descriptor.
+        length (int): The number of bytes to read.
+        offset (int): The offset of the first byte.
+    Returns:
+        bytes: The bytes read, shorter than length at the end of the file.
+    """
+    if hasattr(os, "pread"):
+        return os.pread(fd, length, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, length)
+
+
+def _read_file_blocks(path: str, selectors: tuple, out: np.ndarray, lengths: np.ndarray, block_size: int) -> None:
+    """
+    Helper function. Reads the selected blocks of a single file into
+    preallocated rows with one open and one fstat.
+
+    Args:
+        path (str): The path of the targeted file.
+        selectors (tuple): The block selectors.
+        out (np.ndarray): A (n_blocks, block_size) uint8 row to fill.
+        lengths (np.ndarray): A (n_blocks,) row receiving the number of bytes read.
+        block_size (int): The block size in bytes.
+    """
+    flags = os.O_RDONLY | getattr(os, "O_BINARY", 0)
+    fd = os.open(path, flags)
+    try:
+        file_size = os.fstat(fd).st_size
+        for j, selector in enumerate(selectors):
+            offset = _block_offset(selector, file_size, block_size)
+            if offset >= file_size:
+                lengths[j] = 0
+                continue
+            binary_data = _pread(fd, block_size, offset)
+            out[j, :len(binary_data)] = np.frombuffer(binary_data, dtype=np.uint8)
+            lengths[j] = len(binary_data)
+    finally:
+        os.close(fd)
+
+
+@instrument("read.blocks", batch_arg=0)
+def read_blocks(paths: list, blocks: tuple=("first", "body", "last"), block_size: int=BLOCK_SIZE_BYTES) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reads several blocks of many files in a single pass, opening each file once
+    and reading every block with a positional read. The last block offset is
+    taken from the file size reported by the file system.
+
+    Args:
+        paths (list): The paths of the targeted files.
+        blocks (tuple): Block selectors, each one of "first", "body", "last",
+            or an absolute byte offset.
+        block_size (int): The block size in bytes.
+    Returns:
+        tuple[np.ndarray, np.ndarray]: A contiguous (n_files, n_blocks, block_size)
+            uint8 array whose missing bytes are zeros, and a (n_files, n_blocks)
+            array holding the number of bytes actually read for each block.
+    """
+    selectors = tuple(blocks)
+    for selector in selectors:
+        _block_offset(selector, 0, block_size)
+
+    out = np.zeros((len(paths), len(selectors), block_size), dtype=np.uint8)
+    lengths = np.zeros((len(paths), len(selectors)), dtype=np.int32)
+    for i, path in enumerate(paths):
+        _read_file_blocks(path, selectors, out[i], lengths[i], block_size)
+    return out, lengths
+
+
+@instrument("read.blocks_parallel", batch_arg=0)
+def read_blocks_parallel(
+    paths: list,
+    blocks: tuple=("first", "body", "last"),
+    block_size: int=BLOCK_SIZE_BYTES,
+    directory: str | None=None,
+    max_workers: int=8,
+    max_in_flight: int=64
+) -> tuple[np.ndarray, np.ndarray, dict]:
+    """
+    Reads several blocks of many files concurrently with a thread pool so that
+    reads are issued to the storage device in parallel. Results keep the input
+    order and a file that cannot be read is reported instead of raising.
+
+    Args:
+        paths (list): The paths of the targeted files, e.g. the 'file' values
+            returned by get_file_types when a directory is given.
+        blocks (tuple): Block selectors, each one of "first", "body", "last",
+            or an absolute byte offset.
+        block_size (int): The block size in bytes.
+        directory (str | None): A directory the paths are relative to.
+        max_workers (int): The number of reader threads.
+        max_in_flight (int): The maximum number of files submitted and not yet read.
+    Returns:
+        tuple[np.ndarray, np.ndarray, dict]: The (n_files, n_blocks, block_size)
+            uint8 array and (n_files, n_blocks) byte counts as in read_blocks, and
+            a dictionary mapping the index of each failed file to its error.
+    """
+    if max_workers < 1 or max_in_flight < 1:
+        raise ValueError("max_workers and max_in_flight must be positive.")
+
+    selectors = tuple(blocks)
+    for selector in selectors:
+        _block_offset(selector, 0, block_size)
+
+    out = np.zeros((len(paths), len(selectors), block_size), dtype=np.uint8)
+    lengths = np.zeros((len(paths), len(selectors)), dtype=np.int32)
+    errors = {}
+
+    def collect(i: int, future) -> None:
+        error = future.exception()
+        if error is not None:
+            out[i] = 0
+            lengths[i] = 0
+            errors[i] = error
+
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for i, path in enumerate(paths):
+            if directory is not None:
+                path = os.path.join(directory, path)
+            if len(in_flight) >= max_in_flight:
+                collect(*in_flight.popleft())
+            future = executor.submit(_read_file_blocks, path, selectors, out[i], lengths[i], block_size)
+            in_flight.append((i, future))
+        while in_flight:
+            collect(*in_flight.popleft())
+    return out, lengths, errors
+
+
+def _read_member_blocks(file, file_size: int, selectors: tuple, out: np.ndarray, lengths: np.ndarray, block_size: int) -> None:
+    """
+    Helper function. Reads the selected blocks of an open zip member in offset
+    order, decompressing only up to the end of the furthest block.
+
+    Args:
+        file (zipfile.ZipExtFile): The open member.
+        file_size (int): The uncompressed member size.
+        selectors (tuple): The block selectors.
+        out (np.ndarray): A (n_blocks, block_size) uint8 row to fill.
+        lengths (np.ndarray): A (n_blocks,) row receiving the number of bytes read.
+        block_size (int): The block size in bytes.
+    """
+    offsets = sorted((_block_offset(selector, file_size, block_size), j) for j, selector in enumerate(selectors))
+    previous_offset, previous_data = 0, b""
+    for offset, j in offsets:
+        if offset >= file_size:
+            lengths[j] = 0
+            continue
+        position = file.tell()
+        if offset < position:
+            # the block overlaps the previous one, reuse its bytes instead of seeking back
+            binary_data = previous_data[offset - previous_offset:]
+            if len(binary_data) < block_size:
+                binary_data += file.read(block_size - len(binary_data))
+            binary_data = binary_data[:block_size]
+        else:
+            file.seek(offset)
+            binary_data = file.read(block_size)
+        out[j, :len(binary_data)] = np.frombuffer(binary_data, dtype=np.uint8)
+        lengths[j] = len(binary_data)
+        previous_offset, previous_data = offset, binary_data
+
+
+@instrument("read.zip_blocks", batch_arg=0)
+def read_zip_blocks(zip_paths: list, blocks: tuple=("first", "body", "last"), block_size: int=BLOCK_SIZE_BYTES) -> tuple[np.ndarray, np.ndarray, list]:
+    """
+    Reads several blocks of every file stored in zip archives, such as the
+    govdocs1 "NNN.zip" files, without extracting them to disk. Members are only
+    decompressed up to the end of the furthest selected block, and the last block
+    offset is taken from the uncompressed member size.
+
+    Args:
+        zip_paths (list): The paths of the zip files.
+        blocks (tuple): Block selectors, each one of "first", "body", "last",
+            or an absolute byte offset.
+        block_size (int): The block size in bytes.
+    Returns:
+        tuple[np.ndarray, np.ndarray, list]: The (n_files, n_blocks, block_size)
+            uint8 array and (n_files, n_blocks) byte counts as in read_blocks, and
+            the file names of the members, whose extensions give their types.
+    """
+    selectors = tuple(blocks)
+    for selector in selectors:
+        _block_offset(selector, 0, block_size)
+
+    archives = []
+    for zip_path in zip_paths:
+        with zipfile.ZipFile(zip_path, "r") as zip_ref:
+            archives.append((zip_path, [member for member in zip_ref.infolist() if not member.is_dir()]))
+
+    n_files = sum(len(members) for _, members in archives)
+    out = np.zeros((n_files, len(selectors), block_size), dtype=np.uint8)
+    lengths = np.zeros((n_files, len(selectors)), dtype=np.int32)
+    names = []
+    for zip_path, members in archives:
+        with zipfile.ZipFile(zip_path, "r") as zip_ref:
+            for member in members:
+                i = len(names)
+                with zip_ref.open(member) as file:
+                    _read_member_blocks(file, member.file_size, selectors, out[i], lengths[i], block_size)
+                names.append(os.path.basename(member.filename))
+    return out, lengths, names
+
+
 def print_50bytes_1st_block(df: pd.DataFrame, file_type: str) -> None:
     """
     Prints the first 50 bytes that include file headers for 5 samples.
@@ -145,6 +398,7 @@ def print_50bytes_last_block(df: pd.DataFrame, file_type: str) -> None:
     print("\n")
 
 
+@instrument("featurize.pad_array")
 def pad_array(arr: np.ndarray, length: int=4096, pad_value: int=260) -> np.ndarray:
     """
     Pads Arrays to make them homogeneous. The padding value passed 
@@ -165,6 +419,7 @@ def pad_array(arr: np.ndarray, length: int=4096, pad_value: int=260) -> np.ndarr
     return padded_arr
 
 
+@instrument("featurize.histogram")
 def byte_frequency_histogram(byte_integers: np.ndarray) -> np.ndarray:
     """
     Calculates the frequency of each byte value from 0 to 255.
@@ -177,6 +432,104 @@ def byte_frequency_histogram(byte_integers: np.ndarray) -> np.ndarray:
     return np.bincount(byte_integers, minlength=256)
 
 
+def _pad_dtype(pad_value: int) -> np.dtype:
+    """
+    Helper function. Chooses the smallest unsigned dtype holding bytes and the pad value.
+
+    Args:
+        pad_value (int): The padding value.
+    Returns:
+        np.dtype: uint8 when the pad value is a byte value, uint16 otherwise.
+    """
+    if not 0 <= pad_value <= np.iinfo(np.uint16).max:
+        raise ValueError(f"The padding value must be in the interval 0-65535, got {pad_value}.")
+    return np.dtype(np.uint8) if pad_value <= 255 else np.dtype(np.uint16)
+
+
+@instrument("featurize.bytes_to_array", batch_arg=0)
+def bytes_to_array(byte_sequences: list, length: int=BLOCK_SIZE_BYTES, pad_value: int=PAD_VALUE) -> np.ndarray:
+    """
+    Converts byte sequences to a padded matrix of integers in one shot, replacing
+    the per-byte list comprehension followed by pad_array. Sequences longer than
+    length are truncated.
+
+    Args:
+        byte_sequences (list): The byte sequences, e.g. a column of block bytes.
+        length (int): The length of desire.
+        pad_value (int): The padding value, 260 by default as in pad_array.
+    Returns:
+        np.ndarray: A (n, length) uint16 matrix, or uint8 for a pad value below 256.
+    """
+    out = np.full((len(byte_sequences), length), pad_value, dtype=_pad_dtype(pad_value))
+    for i, byte_sequence in enumerate(byte_sequences):
+        byte_integers = np.frombuffer(byte_sequence, dtype=np.uint8, count=min(len(byte_sequence), length))
+        out[i, :len(byte_integers)] = byte_integers
+    return out
+
+
+@instrument("featurize.pad_blocks", batch_arg=0)
+def pad_blocks(blocks: np.ndarray, lengths: np.ndarray, pad_value: int=PAD_VALUE) -> np.ndarray:
+    """
+    Pads the blocks returned by read_blocks, replacing the bytes past each
+    block length with the padding value.
+
+    Args:
+        blocks (np.ndarray): A (..., block_size) uint8 array.
+        lengths (np.ndarray): The number of valid bytes of each block.
+        pad_value (int): The padding value, 260 by default as in pad_array.
+    Returns:
+        np.ndarray: An array of the same shape as blocks, uint16 or uint8 for a pad value below 256.
+    """
+    padded = blocks.astype(_pad_dtype(pad_value))
+    padding = np.arange(blocks.shape[-1]) >= np.asarray(lengths)[..., None]
+    padded[padding] = pad_value
+    return padded
+
+
+@instrument("featurize.histograms", batch_arg=0)
+def byte_frequency_histograms(blocks: np.ndarray, lengths: np.ndarray | None=None) -> np.ndarray:
+    """
+    Calculates the byte frequency histograms of many blocks with a single
+    bincount over offset byte values.
+
+    Args:
+        blocks (np.ndarray): A (n, block_size) uint8 array.
+        lengths (np.ndarray | None): The number of valid bytes of each block,
+            bytes past it are not counted. All bytes are counted if None.
+    Returns:
+        np.ndarray: A (n, 256) array containing the byte frequencies.
+    """
+    n = len(blocks)
+    offsets = blocks.astype(np.int64) + (np.arange(n, dtype=np.int64) * 256)[:, None]
+    if lengths is not None:
+        offsets = offsets[np.arange(blocks.shape[1]) < np.asarray(lengths)[:, None]]
+    return np.bincount(offsets.ravel(), minlength=n * 256).reshape(n, 256)
+
+
+@instrument("featurize.block_features", batch_arg=0)
+def block_features(blocks: np.ndarray, lengths: np.ndarray, timesteps: int=BLOCK_SIZE_BYTES) -> np.ndarray:
+    """
+    Builds model inputs from read_blocks output: byte frequency histograms for
+    256-timestep models, as used with Ffnn2 and Cnn2, and padded byte integers
+    otherwise.
+
+    Args:
+        blocks (np.ndarray): A (n, block_size) uint8 array.
+        lengths (np.ndarray): The number of valid bytes of each block.
+        timesteps (int): The number of timesteps the model expects.
+    Returns:
+        np.ndarray: A (n, timesteps) array of features.
+    """
+    if timesteps == 256:
+        return byte_frequency_histograms(blocks, lengths)
+    blocks = blocks[:, :timesteps]
+    padded = pad_blocks(blocks, np.minimum(lengths, timesteps))
+    if padded.shape[1] < timesteps:
+        padding = np.full((len(padded), timesteps - padded.shape[1]), PAD_VALUE, dtype=padded.dtype)
+        padded = np.concatenate([padded, padding], axis=1)
+    return padded
+
+
 def convert_cat2num(file_type: str) -> int:
     """ 
     Converts categorical classes to numerical.
@@ -209,4 +562,18 @@ def convert_cat2num(file_type: str) -> int:
     elif file_type == "txt":
         return 11
     elif file_type == "xml":
-        return 12
\ No newline at end of file
+        return 12
+
+
+def convert_num2cat(class_num: int) -> str | None:
+    """ 
+    Converts numerical classes back to categorical, the inverse of convert_cat2num.
+
+    Args:
+        class_num (int): The numerical class.
+    Returns:
+        str | None: The file type, None for an unknown class.
+    """
+    if 1 <= class_num <= len(CLASS_NAMES):
+        return CLASS_NAMES[class_num - 1]
+    return None
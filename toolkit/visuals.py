@@ -1,10 +1,11 @@
+from __future__ import annotations
+
 import numpy as np
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 
-from sklearn.decomposition import PCA
-from sklearn.manifold import TSNE
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 CLASS_COLOURS = {
@@ -30,6 +31,8 @@ def barplot_file_distribution(df: pd.DataFrame) -> None:
     Args:
         df (pd.DataFrame): A pandas DataFrame containing a 'type' column.
     """
+    import matplotlib.pyplot as plt
+
     file_type_counts = df['type'].value_counts()
     file_type_df = file_type_counts.reset_index()
     file_type_df.columns = ['File Type', 'Count']
@@ -50,6 +53,8 @@ def piechart_file_distribution(df: pd.DataFrame) -> None:
     Args:
         df (pd.DataFrame): A DataFrame containing a 'type' column.
     """
+    import matplotlib.pyplot as plt
+
     type_counts = df['type'].value_counts()
     type_percentages = type_counts / type_counts.sum() * 100
     plt.figure(figsize=(8, 8))
@@ -66,6 +71,9 @@ def scatter_file_sizes(df: pd.DataFrame) -> None:
     Args:
         df (pd.DataFrame): A DataFrame containing a 'type' and 'size KB' column.
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     plt.figure(figsize=(10, 6))
     sns.scatterplot(x='type', y='size KB', data=df)
     plt.title('File Size Distribution by Type')
@@ -81,6 +89,9 @@ def boxplot_file_sizes(df: pd.DataFrame, size_min: int, size_max: int) -> None:
     Args:
         df (pd.DataFrame): A DataFrame containing a 'size KB' column.
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     df_sample = df[(df['size KB'] >= size_min) & (df['size KB'] <= size_max)]
 
     plt.figure(figsize=(10, 6))
@@ -98,6 +109,8 @@ def plot_byte_grey_scale(byte_sequence: bytes | np.ndarray) -> None:
     Args:
         byte_sequence (bytes | np.ndarray): A sequence or array of bytes.
     """
+    import matplotlib.pyplot as plt
+
     if type(byte_sequence) == bytes:
         byte_sequence = np.array([b for b in byte_sequence])
     plt.figure(figsize=(10, 2))
@@ -114,6 +127,9 @@ def plot_byte_value_distribution(byte_sequence: bytes | np.ndarray) -> None:
     Args:
         byte_sequence (bytes | np.ndarray): A sequence or array of bytes.
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     if type(byte_sequence) == bytes:
         byte_sequence = np.array([b for b in byte_sequence])
     plt.figure(figsize=(10, 6))
@@ -131,6 +147,9 @@ def correlation_matrix_heatmap(corr_matrix: np.ndarray) -> None:
     Args:
         corr_matrix (np.ndarray): A correlation matrix.
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     plt.figure(figsize=(15, 15))
     sns.heatmap(corr_matrix, annot=False)
     plt.title('Correlation Matrix')
@@ -149,6 +168,9 @@ def plot_pca(byte_sequences: np.ndarray, labels: np.ndarray, class_names: list,
         title (title): The plot title.
         class_colors (dict): Dictionary mapping labels to specific colors.
     """
+    import matplotlib.pyplot as plt
+    from sklearn.decomposition import PCA
+
     reduced_data = PCA(n_components=2).fit_transform(byte_sequences)
     plt.figure(figsize=(10, 6))
     for label, color in class_colours.items():
@@ -170,6 +192,9 @@ def plot_tsne(byte_sequences: np.ndarray, labels: np.ndarray, class_names: list,
         title (title): The plot title.
         class_colors (dict): Dictionary mapping labels to specific colors.
     """
+    import matplotlib.pyplot as plt
+    from sklearn.manifold import TSNE
+
     reduced_data = TSNE(n_components=2).fit_transform(byte_sequences)
     plt.figure(figsize=(10, 6))
     for label, color in class_colours.items():